@@ -0,0 +1,8 @@
+"""Reproducible benchmarks for the calendar service.
+
+    python -m benchmarks seed --events 100000 --db bench.db
+    python -m benchmarks run --db bench.db --out results.json
+    python -m benchmarks compare old.json new.json
+
+The upstream holiday and weather APIs are replaced by local stub servers, so runs are repeatable offline.
+"""
@@ -0,0 +1,53 @@
+import argparse
+import datetime
+import json
+import sys
+
+from benchmarks import harness, seed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    p = commands.add_parser('seed', help='create a database with N events')
+    p.add_argument('--db', default='bench.db')
+    p.add_argument('--events', type=int, default=10000)
+    p.add_argument('--start', type=datetime.date.fromisoformat, default=None,
+                   help='first event date, yyyy-mm-dd (default: 30 days ago)')
+    p.add_argument('--seed', type=int, default=0)
+
+    p = commands.add_parser('run', help='benchmark every endpoint against a seeded database')
+    p.add_argument('--db', default='bench.db')
+    p.add_argument('--requests', type=int, default=500, help='requests per scenario')
+    p.add_argument('--concurrency', type=int, default=8)
+    p.add_argument('--only', nargs='*', help='scenario names to run (default: all)')
+    p.add_argument('--response-cache', default='memory', help="memory, sqlite:<path> or none")
+    p.add_argument('--upstream-latency', type=float, default=0.0, help='seconds added by the stub upstreams')
+    p.add_argument('--out', default='bench_results.json')
+
+    p = commands.add_parser('compare', help='compare two result files')
+    p.add_argument('old')
+    p.add_argument('new')
+    p.add_argument('--threshold', type=float, default=0.10)
+
+    args = parser.parse_args(argv)
+    if args.command == 'seed':
+        seed.write_georef(f'{args.db}.georef.csv')
+        seconds = seed.seed(args.db, args.events, args.start, args.seed)
+        print(f'seeded {args.events} events into {args.db} in {seconds:.1f}s')
+    elif args.command == 'run':
+        results = harness.run(args.db, args.requests, args.concurrency, args.only, args.response_cache,
+                              args.upstream_latency)
+        harness.write(results, args.out)
+        print(f"peak rss {results['peak_rss_kib']} KiB, results written to {args.out}")
+    else:
+        with open(args.old) as f:
+            old = json.load(f)
+        with open(args.new) as f:
+            new = json.load(f)
+        return 1 if harness.compare(old, new, args.threshold) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
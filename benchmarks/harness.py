@@ -0,0 +1,237 @@
+"""Drive every endpoint against a seeded database and report throughput, latency percentiles and peak RSS"""
+import datetime
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks import stubs
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of an already sorted list"""
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, int(round(p / 100 * len(values))) - 1))]
+
+
+def process_tree(pid):
+    """pid followed by all of its live descendants (Linux), e.g. the chart rendering processes"""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(ppid, []).append(int(entry))
+    tree = [pid]
+    for p in tree:
+        tree.extend(children.get(p, ()))
+    return tree
+
+
+def peak_rss(pid):
+    """Sum of the peak resident set sizes of a live process and its descendants in KiB (Linux), or None"""
+    total = None
+    for p in process_tree(pid):
+        try:
+            with open(f'/proc/{p}/status') as f:
+                for line in f:
+                    if line.startswith('VmHWM:'):
+                        total = (total or 0) + int(line.split()[1])
+        except OSError:
+            pass
+    return total
+
+
+class Server:
+    """The app in a child process, pointed at the stub upstreams and the benchmark database"""
+
+    def __init__(self, db, holiday_url, weather_url, response_cache='memory', georef=None):
+        self.port = free_port()
+        env = dict(os.environ, CALENDAR_DB=db, HOLIDAY_URL=holiday_url, WEATHER_URL=weather_url,
+                   HOLIDAY_FALLBACK=f'{db}.holidays.json', GEO_CSV=georef or f'{db}.georef.csv',
+                   GEO_INDEX=f'{db}.georef.idx', RESPONSE_CACHE=response_cache)
+        self.process = subprocess.Popen([sys.executable, '-m', 'benchmarks.server', str(self.port)], env=env,
+                                        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        self.process.stdout.readline()
+        self.url = f'http://127.0.0.1:{self.port}'
+
+    def wait_ready(self, timeout=120):
+        """Block until the background warm-up is done so it does not compete with the measurements"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            status = requests.get(f'{self.url}/ready').status_code
+            if status != 503:  # 404: a revision without a readiness endpoint
+                return
+            time.sleep(0.2)
+
+    def stop(self):
+        rss = peak_rss(self.process.pid)
+        descendants = process_tree(self.process.pid)[1:]
+        self.process.terminate()
+        self.process.wait(10)
+        for pid in descendants:  # whatever did not go down with the server
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        return rss
+
+
+def scenarios(url, max_id, rng):
+    """name -> function(session) issuing one request; each returns the HTTP status"""
+    slot = itertools.count()
+    start = datetime.date(2200, 1, 1)
+    lock = threading.Lock()
+
+    def post(session):
+        with lock:
+            n = next(slot)
+        day = start + datetime.timedelta(days=n // 24)
+        return session.post(f'{url}/events', json={
+            'name': f'Bench {n}', 'date': day.strftime('%d-%m-%Y'), 'from': f'{n % 24:02d}:00',
+            'to': f'{n % 24:02d}:30', 'location': {'street': '1 Main St', 'suburb': 'Sydney', 'state': 'NSW',
+                                                    'post-code': '2000'}}).status_code
+
+    def list_events(session):
+        order = rng.choice(['+id', '-date,+name', '+date,+from', '-id'])
+        fields = rng.choice(['id,name', 'id,name,date,from,to', 'id,suburb,state'])
+        page = rng.randint(1, max(1, max_id // 10))
+        return session.get(f'{url}/events', params={'order': order, 'filter': fields, 'page': page,
+                                                    'size': 10}).status_code
+
+    def detail(session):
+        return session.get(f'{url}/events/{rng.randint(1, max_id)}').status_code
+
+    def stats_json(session):
+        return session.get(f'{url}/events/statistics').status_code
+
+    def stats_image(session):
+        return session.get(f'{url}/events/statistics', params={'format': 'image'}).status_code
+
+    return {'post_event': post, 'list_events': list_events, 'get_event': detail, 'statistics_json': stats_json,
+            'statistics_image': stats_image}
+
+
+def run_scenario(fn, requests_per_scenario, concurrency):
+    local = threading.local()
+
+    def one(_):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        began = time.perf_counter()
+        try:
+            status = fn(session)
+        except requests.RequestException:
+            status = None
+        return time.perf_counter() - began, status
+
+    began = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        samples = list(pool.map(one, range(requests_per_scenario)))
+    elapsed = time.perf_counter() - began
+    latencies = sorted(s[0] for s in samples)
+    # a 4xx is an error too: a run whose posts all overlap would otherwise look faster
+    errors = sum(1 for _, status in samples if status is None or not 200 <= status < 300)
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'seconds': round(elapsed, 4),
+        'throughput_rps': round(len(samples) / elapsed, 2),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3)
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(db, requests_per_scenario=500, concurrency=8, only=None, response_cache='memory', upstream_latency=0.0,
+        seed=0):
+    # the run writes (posts, caches, migrations), so it gets a copy and every run starts from the same data
+    workdir = tempfile.mkdtemp(prefix='bench-')
+    copy = os.path.join(workdir, os.path.basename(db))
+    source, target = sqlite3.connect(db), sqlite3.connect(copy)
+    source.backup(target)
+    source.close()
+    target.close()
+    stub, holiday_url, weather_url = stubs.start(upstream_latency)
+    server = Server(copy, holiday_url, weather_url, response_cache, georef=f'{db}.georef.csv')
+    try:
+        server.wait_ready()
+        max_id = requests.get(f'{server.url}/events/statistics').json()['total'] or 1
+        rng = random.Random(seed)
+        results = {}
+        for name, fn in scenarios(server.url, max_id, rng).items():
+            if only and name not in only:
+                continue
+            results[name] = run_scenario(fn, requests_per_scenario, concurrency)
+            print(f"{name:18} {results[name]['throughput_rps']:>9} req/s  p50 {results[name]['p50_ms']:>8} ms  "
+                  f"p95 {results[name]['p95_ms']:>8} ms  p99 {results[name]['p99_ms']:>8} ms  "
+                  f"errors {results[name]['errors']}", flush=True)
+    finally:
+        rss = server.stop()
+        stub.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        'revision': git_revision(),
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {'events': max_id, 'requests_per_scenario': requests_per_scenario, 'concurrency': concurrency,
+                   'response_cache': response_cache, 'upstream_latency': upstream_latency},
+        'peak_rss_kib': rss,
+        'scenarios': results
+    }
+
+
+def compare(old, new, threshold=0.10):
+    """Print per-scenario changes; returns the names whose p95 or throughput regressed by more than `threshold`"""
+    regressions = []
+    for name, after in new['scenarios'].items():
+        before = old['scenarios'].get(name)
+        if before is None:
+            continue
+        rps = after['throughput_rps'] / before['throughput_rps'] - 1
+        p95 = after['p95_ms'] / before['p95_ms'] - 1 if before['p95_ms'] else 0.0
+        flag = rps < -threshold or p95 > threshold
+        if flag:
+            regressions.append(name)
+        print(f"{name:18} throughput {rps:+7.1%}  p95 {p95:+7.1%}{'  REGRESSION' if flag else ''}")
+    if old.get('peak_rss_kib') and new.get('peak_rss_kib'):
+        print(f"{'peak rss':18} {new['peak_rss_kib'] / old['peak_rss_kib'] - 1:+7.1%}")
+    return regressions
+
+
+def write(results, path):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
@@ -0,0 +1,93 @@
+"""Fill a database with N non-overlapping events spread over dates and suburbs"""
+import datetime
+import math
+import random
+import sqlite3
+import time
+
+import source_code
+
+SUBURBS = [
+    ('Sydney', 'NSW', '2000', -33.8688, 151.2093),
+    ('Parramatta', 'NSW', '2150', -33.8150, 151.0011),
+    ('Newcastle', 'NSW', '2300', -32.9283, 151.7817),
+    ('Melbourne', 'VIC', '3000', -37.8136, 144.9631),
+    ('Geelong', 'VIC', '3220', -38.1499, 144.3617),
+    ('Brisbane City', 'QLD', '4000', -27.4698, 153.0251),
+    ('Cairns City', 'QLD', '4870', -16.9186, 145.7781),
+    ('Perth', 'WA', '6000', -31.9505, 115.8605),
+    ('Adelaide', 'SA', '5000', -34.9285, 138.6007),
+    ('Hobart', 'TAS', '7000', -42.8821, 147.3272),
+    ('Darwin City', 'NT', '0800', -12.4634, 130.8456),
+    ('Canberra', 'ACT', '2600', -35.2809, 149.1300)
+]
+STATE_NAMES = {
+    'NSW': 'New South Wales', 'VIC': 'Victoria', 'QLD': 'Queensland', 'WA': 'Western Australia',
+    'SA': 'South Australia', 'TAS': 'Tasmania', 'NT': 'Northern Territory', 'ACT': 'Australian Capital Territory'
+}
+SLOTS_PER_DAY = 24
+
+
+def write_georef(path):
+    """A georef CSV covering the seeded suburbs, in the same layout as georef-australia-state-suburb.csv"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('Geo Point;Official Name Suburb;Official Name State\n')
+        for suburb, state, _, lat, lng in SUBURBS:
+            f.write(f'{lat}, {lng};{suburb};{STATE_NAMES[state]}\n')
+
+
+def day_order(days, rng):
+    """range(days) in a random order, generated lazily: i -> (a * i + b) % days with a coprime to days"""
+    a = 1
+    if days > 1:
+        a = rng.randrange(1, days)
+        while math.gcd(a, days) != 1:
+            a = rng.randrange(1, days)
+    b = rng.randrange(days)
+    return ((a * i + b) % days for i in range(days))
+
+
+def events(n, start, seed=0):
+    """Yield rows in source_code.INSERT_EVENT order.
+
+    Days are filled with up to SLOTS_PER_DAY half-hour events starting on the hour, so no two events overlap.
+    Days are visited in a random order and each day's hours shuffled, so memory does not grow with n.
+    """
+    rng = random.Random(seed)
+    days = max(1, -(-n // SLOTS_PER_DAY))
+    last_update = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    i = 0
+    for d in day_order(days, rng):
+        day = start + datetime.timedelta(days=d)
+        hours = list(range(SLOTS_PER_DAY))
+        rng.shuffle(hours)
+        for h in hours[:n - i]:
+            suburb, state, post_code, _, _ = rng.choice(SUBURBS)
+            yield (f'Event {i}', day.isoformat(), h * 60, h * 60 + 30, f'{rng.randint(1, 400)} Main St', suburb,
+                   state, post_code, rng.choice([None, 'Team meeting', 'Workshop', 'Lunch']), last_update)
+            i += 1
+        if i >= n:
+            return
+
+
+def seed(path, n, start=None, seed=0, batch=10000):
+    """Create the database at `path` with n events starting on `start` (default: 30 days ago), or extend it;
+    an existing database gets its new events after its last event day, so they cannot overlap the old ones"""
+    start = start or datetime.date.today() - datetime.timedelta(days=30)
+    db = sqlite3.connect(path, isolation_level=None)
+    db.execute('PRAGMA journal_mode = WAL')
+    source_code.migrate(db)
+    last = db.execute('SELECT MAX(date_iso) FROM events').fetchone()[0]
+    if last is not None:
+        start = max(start, datetime.date.fromisoformat(last) + datetime.timedelta(days=1))
+    started = time.perf_counter()
+    rows = events(n, start, seed)
+    while True:
+        chunk = [row for _, row in zip(range(batch), rows)]
+        if not chunk:
+            break
+        db.execute('BEGIN IMMEDIATE')
+        db.executemany(source_code.INSERT_EVENT, chunk)
+        db.execute('COMMIT')
+    db.close()
+    return time.perf_counter() - started
@@ -0,0 +1,16 @@
+"""Run the app under a threaded WSGI server for the harness: python -m benchmarks.server PORT"""
+import sys
+
+from werkzeug.serving import make_server
+
+import source_code
+
+
+def main(port):
+    server = make_server('127.0.0.1', port, source_code.create_app(), threaded=True)
+    print('ready', flush=True)
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]))
@@ -0,0 +1,61 @@
+"""Local stand-ins for date.nager.at and 7timer.info, so benchmarks never touch the network"""
+import datetime
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+
+def holidays(year):
+    return [
+        {'date': f'{year}-01-01', 'name': "New Year's Day", 'global': True, 'counties': None},
+        {'date': f'{year}-01-26', 'name': 'Australia Day', 'global': True, 'counties': None},
+        {'date': f'{year}-03-11', 'name': 'Labour Day', 'global': False, 'counties': ['AU-VIC']},
+        {'date': f'{year}-04-25', 'name': 'Anzac Day', 'global': True, 'counties': None},
+        {'date': f'{year}-12-25', 'name': 'Christmas Day', 'global': True, 'counties': None}
+    ]
+
+
+def forecast():
+    now = datetime.datetime.now(datetime.timezone.utc)
+    init = now.replace(hour=now.hour - now.hour % 6, minute=0, second=0, microsecond=0)
+    return {
+        'product': 'civil',
+        'init': init.strftime('%Y%m%d%H'),
+        'dataseries': [{'timepoint': t, 'cloudcover': 2, 'weather': 'clearday', 'temp2m': 21, 'rh2m': '55%',
+                        'wind10m': {'direction': 'SE', 'speed': 2}, 'prec_type': 'none'} for t in range(3, 195, 3)]
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path.startswith('/api/v2/publicholidays/'):
+            body = holidays(int(path.split('/')[4]))
+        elif path.startswith('/bin/civil.php'):
+            body = forecast()
+        else:
+            self.send_error(404)
+            return
+        if self.latency:
+            threading.Event().wait(self.latency)
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start(latency=0.0):
+    """Serve both stubs on a free local port; returns (server, holiday url template, weather url)"""
+    handler = type('Handler', (StubHandler,), {'latency': latency})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_port}'
+    return server, f'{base}/api/v2/publicholidays/{{year}}/AU', f'{base}/bin/civil.php'
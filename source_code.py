@@ -1,24 +1,153 @@
+import argparse
+import base64
+import bisect
+import cProfile
+import hashlib
+import heapq
 import sqlite3
 from _datetime import datetime
+import csv
 import datetime
-from flask import Flask, request, send_file
+import difflib
+import functools
+import itertools
+import json
+import mmap
+import multiprocessing
+import os
+import queue
+import shutil
+import signal
+import socket
+import struct
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.connection import Client, Listener
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from flask import Flask, Response, g, request, stream_with_context
 from flask_restx import Api, Resource, fields
 import requests
-import pandas as pd
-from io import BytesIO
-import matplotlib.pyplot as plt
-from matplotlib.patches import Patch
-import matplotlib
-matplotlib.use('Agg')
-
-app = Flask(__name__)
-api = Api(app, version='1.0', title='My Calendar',
+from requests.adapters import HTTPAdapter
+from io import BytesIO, StringIO
+from urllib.parse import quote
+from werkzeug.serving import make_server
+
+# bound to an app in create_app(); matplotlib is only imported when the first chart is drawn
+api = Api(version='1.0', title='My Calendar',
           description='A time-management and scheduling calendar service for Australians')
 
-conn = sqlite3.connect('mydb.db', check_same_thread=False)
-c = conn.cursor()
 
-c.execute('''CREATE TABLE IF NOT EXISTS events
+class Metrics:
+    """Counters and latency histograms for the hot paths, rendered in the Prometheus text format"""
+    BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+    HELP = {
+        'calendar_request_seconds': 'Request latency by route, method and status',
+        'calendar_stage_seconds': 'Time spent in each stage of request handling',
+        'calendar_db_queries_total': 'SQL statements executed',
+        'calendar_upstream_calls_total': 'Calls to upstream APIs by source and outcome',
+        'calendar_cache_requests_total': 'Cache lookups by cache and result (hit or miss)'
+    }
+
+    def __init__(self):
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            h = self._histograms.get(key)
+            if h is None:
+                h = self._histograms[key] = [0] * (len(self.BUCKETS) + 2)
+            h[bisect.bisect_left(self.BUCKETS, seconds)] += 1
+            h[-1] += seconds
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def cache(self, name, hit):
+        self.inc('calendar_cache_requests_total', cache=name, result='hit' if hit else 'miss')
+
+    def snapshot(self):
+        """This process's numbers as JSON-able lists, for render() in another process"""
+        with self._lock:
+            return ([[name, labels, value] for (name, labels), value in self._counters.items()],
+                    [[name, labels, list(h)] for (name, labels), h in self._histograms.items()])
+
+    def render(self, snapshots=None):
+        """The Prometheus text for this process, or for the sum of `snapshots` (e.g. those of every worker)"""
+        if snapshots is None:
+            snapshots = [self.snapshot()]
+        counters = {}
+        histograms = {}
+        for snapshot_counters, snapshot_histograms in snapshots:
+            for name, labels, value in snapshot_counters:
+                key = (name, tuple(tuple(label) for label in labels))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, h in snapshot_histograms:
+                total = histograms.setdefault((name, tuple(tuple(label) for label in labels)), [0] * len(h))
+                for i, value in enumerate(h):
+                    total[i] += value
+        lines = []
+        for name in sorted({k[0] for k in counters}):
+            lines += [f'# HELP {name} {self.HELP.get(name, name)}', f'# TYPE {name} counter']
+            lines += [f'{name}{self._labels(labels)} {value}' for (n, labels), value in sorted(counters.items())
+                      if n == name]
+        for name in sorted({k[0] for k in histograms}):
+            lines += [f'# HELP {name} {self.HELP.get(name, name)}', f'# TYPE {name} histogram']
+            for (n, labels), h in sorted(histograms.items()):
+                if n != name:
+                    continue
+                total = 0
+                for le, count in zip(self.BUCKETS + ('+Inf',), h):
+                    total += count
+                    lines.append(f'{name}_bucket{self._labels(labels + (("le", le),))} {total}')
+                lines.append(f'{name}_sum{self._labels(labels)} {h[-1]}')
+                lines.append(f'{name}_count{self._labels(labels)} {total}')
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _labels(labels):
+        if not labels:
+            return ''
+        return '{' + ','.join(f'{k}="{str(v)}"' for k, v in labels) + '}'
+
+
+metrics = Metrics()
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Counts and times every statement run through execute/executemany"""
+
+    def execute(self, sql, parameters=()):
+        metrics.inc('calendar_db_queries_total')
+        with metrics.timer('calendar_stage_seconds', stage='sql'):
+            return super().execute(sql, parameters)
+
+    def executemany(self, sql, parameters):
+        metrics.inc('calendar_db_queries_total')
+        with metrics.timer('calendar_stage_seconds', stage='sql'):
+            return super().executemany(sql, parameters)
+
+
+DB_PATH = os.environ.get('CALENDAR_DB', 'mydb.db')
+
+SCHEMA = '''CREATE TABLE IF NOT EXISTS events
              (id INTEGER PRIMARY KEY AUTOINCREMENT,
              name TEXT NOT NULL,
              date TEXT NOT NULL,
@@ -29,8 +158,1360 @@ c.execute('''CREATE TABLE IF NOT EXISTS events
              state TEXT NOT NULL,
              post_code TEXT NOT NULL,
              description TEXT,
-             last_update TEXT);''')
-conn.commit()
+             last_update TEXT);'''
+
+
+EVENT_COLUMNS = 'id, name, date_iso, start_min, end_min, street, suburb, state, post_code, description, last_update'
+
+# The API speaks dd-mm-yyyy and HH:MM; the table stores yyyy-mm-dd and minutes since midnight.
+# Every conversion between the two goes through the helpers below.
+TIMES = tuple(f'{m // 60:02d}:{m % 60:02d}' for m in range(24 * 60))
+
+
+def _digits(text, low, high):
+    return text.isascii() and text.isdigit() and low <= len(text) <= high
+
+
+@functools.lru_cache(maxsize=8192)
+def _parse_date(text):
+    parts = text.split('-')
+    if len(parts) != 3 or not (_digits(parts[0], 1, 2) and _digits(parts[1], 1, 2) and _digits(parts[2], 4, 4)):
+        return None
+    try:
+        return datetime.date(int(parts[2]), int(parts[1]), int(parts[0])).isoformat()
+    except ValueError:
+        return None
+
+
+def parse_date(text):
+    """dd-mm-yyyy -> yyyy-mm-dd (sortable), or None if the date is malformed"""
+    return _parse_date(text) if isinstance(text, str) else None
+
+
+def format_date(date_iso):
+    """yyyy-mm-dd -> dd-mm-yyyy, the format the API speaks"""
+    return date_iso and f'{date_iso[8:10]}-{date_iso[5:7]}-{date_iso[0:4]}'
+
+
+@functools.lru_cache(maxsize=8192)
+def to_date(date_iso):
+    """yyyy-mm-dd -> datetime.date, or None"""
+    return datetime.date.fromisoformat(date_iso) if date_iso else None
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_time(text):
+    parts = text.split(':')
+    if len(parts) not in (2, 3) or not all(_digits(p, 1, 2) for p in parts):
+        return None
+    hours, minutes = int(parts[0]), int(parts[1])
+    if hours > 23 or minutes > 59 or (len(parts) == 3 and int(parts[2]) > 59):
+        return None
+    return hours * 60 + minutes
+
+
+def parse_time(text):
+    """'09:30' or '09:30:00' -> 570 (minutes since midnight, seconds dropped), or None if the time is malformed"""
+    return _parse_time(text) if isinstance(text, str) else None
+
+
+def format_time(minutes):
+    """570 -> '09:30'"""
+    return None if minutes is None else TIMES[minutes]
+
+
+def _count_triggers(db):
+    db.execute("CREATE TRIGGER IF NOT EXISTS events_count_insert AFTER INSERT ON events "
+               "BEGIN UPDATE counters SET value = value + 1 WHERE name = 'events'; END")
+    db.execute("CREATE TRIGGER IF NOT EXISTS events_count_delete AFTER DELETE ON events "
+               "BEGIN UPDATE counters SET value = value - 1 WHERE name = 'events'; END")
+
+
+def _daily_count_triggers(db):
+    db.execute('''CREATE TRIGGER IF NOT EXISTS daily_counts_insert AFTER INSERT ON events WHEN NEW.date_iso IS NOT NULL
+                  BEGIN
+                      INSERT OR IGNORE INTO daily_counts (date_iso, count) VALUES (NEW.date_iso, 0);
+                      UPDATE daily_counts SET count = count + 1 WHERE date_iso = NEW.date_iso;
+                  END''')
+    db.execute('''CREATE TRIGGER IF NOT EXISTS daily_counts_delete AFTER DELETE ON events WHEN OLD.date_iso IS NOT NULL
+                  BEGIN
+                      UPDATE daily_counts SET count = count - 1 WHERE date_iso = OLD.date_iso;
+                      DELETE FROM daily_counts WHERE date_iso = OLD.date_iso AND count <= 0;
+                  END''')
+    db.execute('''CREATE TRIGGER IF NOT EXISTS daily_counts_update AFTER UPDATE OF date_iso ON events
+                  WHEN OLD.date_iso IS NOT NEW.date_iso
+                  BEGIN
+                      UPDATE daily_counts SET count = count - 1 WHERE date_iso = OLD.date_iso;
+                      DELETE FROM daily_counts WHERE date_iso = OLD.date_iso AND count <= 0;
+                      INSERT OR IGNORE INTO daily_counts (date_iso, count)
+                          SELECT NEW.date_iso, 0 WHERE NEW.date_iso IS NOT NULL;
+                      UPDATE daily_counts SET count = count + 1 WHERE date_iso = NEW.date_iso;
+                  END''')
+
+
+def _data_version_triggers(db):
+    for action in ('INSERT', 'UPDATE', 'DELETE'):
+        db.execute(f"CREATE TRIGGER IF NOT EXISTS data_version_{action.lower()} AFTER {action} ON events "
+                   f"BEGIN UPDATE counters SET value = value + 1 WHERE name = 'data_version'; END")
+
+
+def _add_date_iso(db):
+    db.execute("ALTER TABLE events ADD COLUMN date_iso TEXT")
+    rows = db.execute("SELECT id, date FROM events").fetchall()
+    db.executemany("UPDATE events SET date_iso = ? WHERE id = ?", [(parse_date(date), i) for i, date in rows])
+    db.execute("CREATE INDEX IF NOT EXISTS events_date_start_id ON events (date_iso, start_time, id)")
+
+
+def _add_counters(db):
+    db.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+    db.execute("INSERT OR REPLACE INTO counters (name, value) SELECT 'events', COUNT(*) FROM events")
+    _count_triggers(db)
+
+
+def _add_slot_index(db):
+    db.execute("CREATE INDEX IF NOT EXISTS events_date_slot ON events (date_iso, start_time, end_time)")
+
+
+def _add_daily_counts(db):
+    db.execute("CREATE TABLE IF NOT EXISTS daily_counts (date_iso TEXT PRIMARY KEY, count INTEGER NOT NULL) WITHOUT ROWID")
+    db.execute("INSERT OR REPLACE INTO daily_counts (date_iso, count) "
+               "SELECT date_iso, COUNT(*) FROM events WHERE date_iso IS NOT NULL GROUP BY date_iso")
+    _daily_count_triggers(db)
+
+
+def _add_data_version(db):
+    db.execute("INSERT OR IGNORE INTO counters (name, value) VALUES ('data_version', 0)")
+    _data_version_triggers(db)
+
+
+def _compact_events(db):
+    """Rebuild events without the dd-mm-yyyy / HH:MM text columns: date_iso plus start_min and end_min"""
+    seq = db.execute("SELECT seq FROM sqlite_sequence WHERE name = 'events'").fetchone()
+    # nullable: rows written before dates and times were validated keep NULL rather than being dropped
+    db.execute('''CREATE TABLE events_compact
+                  (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  name TEXT NOT NULL,
+                  date_iso TEXT,
+                  start_min INTEGER,
+                  end_min INTEGER,
+                  street TEXT NOT NULL,
+                  suburb TEXT NOT NULL,
+                  state TEXT NOT NULL,
+                  post_code TEXT NOT NULL,
+                  description TEXT,
+                  last_update TEXT)''')
+    rows = db.execute("SELECT id, name, date, date_iso, start_time, end_time, street, suburb, state, post_code, "
+                      "description, last_update FROM events")
+    db.executemany(f"INSERT INTO events_compact ({EVENT_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                   ((r[0], r[1], r[3] or parse_date(r[2]), parse_time(r[4]), parse_time(r[5])) + tuple(r[6:])
+                    for r in rows))
+    db.execute("DROP TABLE events")
+    db.execute("ALTER TABLE events_compact RENAME TO events")
+    if seq is not None:
+        # keep ids of deleted events from being handed out again
+        # (sqlite_sequence has no key to upsert on, and has no row yet if the table was copied empty)
+        if not db.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'events'", (seq[0],)).rowcount:
+            db.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('events', ?)", (seq[0],))
+    db.execute("CREATE INDEX events_date_start_id ON events (date_iso, start_min, id)")
+    db.execute("CREATE INDEX events_date_slot ON events (date_iso, start_min, end_min)")
+    _count_triggers(db)
+    _daily_count_triggers(db)
+    _data_version_triggers(db)
+
+
+def _add_series(db):
+    db.execute('''CREATE TABLE IF NOT EXISTS series
+                  (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  name TEXT NOT NULL,
+                  date_iso TEXT NOT NULL,
+                  start_min INTEGER NOT NULL,
+                  end_min INTEGER NOT NULL,
+                  street TEXT NOT NULL,
+                  suburb TEXT NOT NULL,
+                  state TEXT NOT NULL,
+                  post_code TEXT NOT NULL,
+                  description TEXT,
+                  last_update TEXT,
+                  freq TEXT NOT NULL,
+                  interval INTEGER NOT NULL,
+                  count INTEGER,
+                  until TEXT,
+                  exdates TEXT NOT NULL)''')
+    for action in ('INSERT', 'UPDATE', 'DELETE'):
+        db.execute(f"CREATE TRIGGER IF NOT EXISTS series_version_{action.lower()} AFTER {action} ON series "
+                   f"BEGIN UPDATE counters SET value = value + 1 WHERE name = 'data_version'; END")
+
+
+MIGRATIONS = [_add_date_iso, _add_counters, _add_slot_index, _add_daily_counts, _add_data_version, _compact_events,
+              _add_series]
+
+
+def migrate(db):
+    """Bring the schema up to date, one transaction per step, tracked in PRAGMA user_version"""
+    db.execute(SCHEMA)
+    while True:
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            # re-read under the write lock, another process may have migrated meanwhile
+            version = db.execute("PRAGMA user_version").fetchone()[0]
+            if version >= len(MIGRATIONS):
+                db.execute("COMMIT")
+                return
+            MIGRATIONS[version](db)
+            db.execute(f"PRAGMA user_version = {version + 1}")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+
+class Database:
+    """Pool of sqlite connections in WAL mode; a thread keeps one until release(), writes use explicit transactions"""
+
+    def __init__(self, path=DB_PATH, pool_size=16, cache_size=16 * 1024, mmap_size=256 * 1024 * 1024, busy_timeout=30):
+        self.path = path
+        self.cache_size = cache_size
+        self.mmap_size = mmap_size
+        self.busy_timeout = busy_timeout
+        self._idle = queue.LifoQueue(pool_size)
+        self._local = threading.local()
+        self._migrated = False
+        self._lock = threading.Lock()
+
+    def connection(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            try:
+                db = self._idle.get_nowait()
+            except queue.Empty:
+                db = self._connect()
+            self._local.db = db
+        return db
+
+    def release(self):
+        """Return this thread's connection to the pool (called at the end of every request)"""
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            return
+        self._local.db = None
+        if db.in_transaction:
+            db.execute("ROLLBACK")
+        try:
+            self._idle.put_nowait(db)
+        except queue.Full:
+            db.close()
+
+    def execute(self, sql, params=()):
+        return self.connection().execute(sql, params)
+
+    @contextmanager
+    def transaction(self):
+        """BEGIN IMMEDIATE ... COMMIT, rolled back on any exception"""
+        db = self.connection()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def _connect(self):
+        # isolation_level=None: sqlite3 never opens transactions behind our back.
+        # A pooled connection moves between threads, but is only ever used by one at a time.
+        db = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None, check_same_thread=False,
+                             cached_statements=256, factory=InstrumentedConnection)
+        db.execute("PRAGMA journal_mode = WAL")
+        db.execute("PRAGMA synchronous = NORMAL")
+        db.execute(f"PRAGMA cache_size = -{int(self.cache_size)}")
+        db.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        db.execute("PRAGMA temp_store = MEMORY")
+        with self._lock:
+            if not self._migrated:
+                migrate(db)
+                self._migrated = True
+        return db
+
+
+database = Database()
+
+
+def release_connection(exc):
+    database.release()
+
+
+def count_between(first, last):
+    """Number of events from `first` to `last` (inclusive, dates), summed from daily_counts, plus the series
+    occurrences in that range"""
+    stored = database.execute("SELECT COALESCE(SUM(count), 0) FROM daily_counts WHERE date_iso BETWEEN ? AND ?",
+                              (first.isoformat(), last.isoformat())).fetchone()[0]
+    return stored + sum(s.count_between(first, last) for s in series_between(first.isoformat(), last.isoformat()))
+
+
+def data_version():
+    """Bumped by a trigger on every write to events, in any process"""
+    return database.execute("SELECT value FROM counters WHERE name = 'data_version'").fetchone()[0]
+
+
+def check_fields(values):
+    """Raise ValueError unless every {field: value} given is a non-empty string (description: a string or null)"""
+    for field, value in values.items():
+        if field == 'description':
+            if value is not None and not isinstance(value, str):
+                raise ValueError('Invalid field. description must be a string.')
+        elif not isinstance(value, str) or not value.strip():
+            raise ValueError(f'Invalid field. {field} must be a non-empty string.')
+
+
+def parse_event(info):
+    """Validate a POST /events body; returns the stored row tuple (INSERT_EVENT order, without last_update)
+    or raises ValueError with the message"""
+    try:
+        location = info['location']
+        values = (info['name'], info['date'], info['from'], info['to'], location['street'], location['suburb'],
+                  location['state'], location['post-code'])
+    except (KeyError, TypeError):
+        raise ValueError('Missing field. An event needs name, date, from, to and location '
+                         '(street, suburb, state, post-code).')
+    name, date, start_time, end_time, street, suburb, state, post_code = values
+    description = info.get('description')
+    check_fields({'name': name, 'street': street, 'suburb': suburb, 'state': state, 'post-code': post_code,
+                  'description': description})
+    date_iso = parse_date(date)
+    if date_iso is None:
+        raise ValueError('Invalid date input. Please follow the format: DD-MM-YYYY.')
+    start_min = parse_time(start_time)
+    end_min = parse_time(end_time)
+    if start_min is None or end_min is None:
+        raise ValueError('Invalid time input. Please follow the format: HH:MM or HH:MM:SS.')
+    if start_min >= end_min:
+        raise ValueError('Invalid time range. An event must end after it starts.')
+    return name, date_iso, start_min, end_min, street, suburb, state, post_code, description
+
+
+INSERT_EVENT = ("INSERT INTO events (name, date_iso, start_min, end_min, street, suburb, state, post_code, description, "
+                "last_update) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+EXPORT_COLUMNS = ['id', 'name', 'date', 'from', 'to', 'street', 'suburb', 'state', 'post_code', 'description',
+                  'last_update']
+
+
+def find_overlap(date_iso, start_min, end_min, exclude=None):
+    """Id of an event on that day intersecting [start_min, end_min), or None; a range scan of events_date_slot"""
+    row = database.execute("SELECT id FROM events WHERE date_iso = ? AND start_min < ? AND end_min > ? "
+                           "AND id IS NOT ? LIMIT 1", (date_iso, end_min, start_min, exclude)).fetchone()
+    return row and row[0]
+
+
+class SlotChecker:
+    """Checks a batch of candidate slots against the table, the series and the slots already accepted in the batch"""
+
+    def __init__(self):
+        self._days = {}
+
+    def check(self, date_iso, start_min, end_min, ref=None, exclude=None):
+        """Return ('slot', ref), ('event', id) or ('series', id) for the first collision, or accept the slot and
+        return None"""
+        slots = self._days.setdefault(date_iso, [])
+        # accepted slots never overlap each other, so only the last one starting before end_min can collide
+        i = bisect.bisect_left(slots, (end_min,))
+        if i and slots[i - 1][1] > start_min:
+            return 'slot', slots[i - 1][2]
+        hit = find_overlap(date_iso, start_min, end_min, exclude)
+        if hit:
+            return 'event', hit
+        hit = find_series_overlap(date_iso, start_min, end_min)
+        if hit:
+            return 'series', hit
+        bisect.insort(slots, (start_min, end_min, ref))
+        return None
+
+
+def neighbours(date_iso, start_min, event_id):
+    """Ids of the events right before and after the given one, ordered by (date, start time, id)"""
+    previous_event = database.execute("SELECT id FROM events WHERE (date_iso, start_min, id) < (?, ?, ?) "
+                                      "ORDER BY date_iso DESC, start_min DESC, id DESC LIMIT 1",
+                                      (date_iso, start_min, event_id)).fetchone()
+    next_event = database.execute("SELECT id FROM events WHERE (date_iso, start_min, id) > (?, ?, ?) "
+                                  "ORDER BY date_iso, start_min, id LIMIT 1", (date_iso, start_min, event_id)).fetchone()
+    return previous_event and previous_event[0], next_event and next_event[0]
+
+
+# unbounded series are expanded at most this far past today (overlap checks against single events are exact)
+SERIES_HORIZON = datetime.timedelta(days=int(os.environ.get('SERIES_HORIZON_DAYS', 730)))
+SERIES_COLUMNS = EVENT_COLUMNS + ', freq, interval, count, until, exdates'
+INSERT_SERIES = ("INSERT INTO series (name, date_iso, start_min, end_min, street, suburb, state, post_code, description, "
+                 "last_update, freq, interval, count, until, exdates) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+
+
+class Series:
+    """A recurring event stored once: RRULE-style FREQ (daily, weekly or monthly), INTERVAL, COUNT or UNTIL
+    and EXDATEs. Weekly keeps the first date's weekday and monthly its day of the month (months without that
+    day are skipped); occurrences are generated on demand for the window being asked about.
+    """
+    FREQS = ('daily', 'weekly', 'monthly')
+
+    def __init__(self, row):
+        self.id = row[0]
+        self.row = row[:11]  # the event columns every occurrence shares, apart from its date
+        self.start_min = row[3]
+        self.end_min = row[4]
+        self.freq, self.interval, self.count = row[11], row[12], row[13]
+        self.start = to_date(row[2])
+        self.until = to_date(row[14])
+        self.exdates = frozenset(json.loads(row[15]))
+        # only a series without an end is cut off at the horizon
+        self.end = self.until if self.until is not None else datetime.date.today() + SERIES_HORIZON
+
+    def occurs_on(self, day):
+        """Whether the rule produces `day` (exact, not limited by the horizon)"""
+        if day < self.start or (self.until is not None and day > self.until) or day.isoformat() in self.exdates:
+            return False
+        if self.freq == 'monthly':
+            months = (day.year - self.start.year) * 12 + day.month - self.start.month
+            return day.day == self.start.day and months % self.interval == 0
+        return (day - self.start).days % (self.interval * (7 if self.freq == 'weekly' else 1)) == 0
+
+    def occurrences(self, first, last, reverse=False):
+        """Dates of the occurrences between `first` and `last` (inclusive), lazily, in order"""
+        first = max(first, self.start)
+        last = min(last, self.end)
+        return (day for day in self.dates(first, last, reverse) if day.isoformat() not in self.exdates)
+
+    def count_between(self, first, last):
+        return sum(1 for _ in self.occurrences(first, last))
+
+    def dates(self, first, last, reverse=False):
+        """Every date the rule produces between `first` and `last`, before exceptions and limits"""
+        if first > last:
+            return
+        if self.freq == 'monthly':
+            months = range((first.year - self.start.year) * 12 + first.month - self.start.month,
+                           (last.year - self.start.year) * 12 + last.month - self.start.month + 1)
+            for m in (reversed(months) if reverse else months):
+                if m < 0 or m % self.interval:
+                    continue
+                year, month = divmod(self.start.month - 1 + m, 12)
+                try:
+                    day = datetime.date(self.start.year + year, month + 1, self.start.day)
+                except ValueError:
+                    continue
+                if first <= day <= last:
+                    yield day
+            return
+        step = self.interval * (7 if self.freq == 'weekly' else 1)
+        lowest = max(0, -(-(first - self.start).days // step))
+        highest = (last - self.start).days // step
+        for k in (range(highest, lowest - 1, -1) if reverse else range(lowest, highest + 1)):
+            yield self.start + datetime.timedelta(days=k * step)
+
+    def event_row(self, day):
+        """An occurrence as an events row (EVENT_COLUMNS order, id None)"""
+        return (None, self.row[1], day.isoformat()) + self.row[3:]
+
+
+def parse_repeat(info, date_iso):
+    """Validate the 'repeat' part of a POST /series body; returns (freq, interval, count, until, exdates)
+    with `until` resolved from `count`, or raises ValueError with the message"""
+    if not isinstance(info, dict) or info.get('freq') not in Series.FREQS:
+        raise ValueError('Invalid repeat. freq must be one of daily, weekly or monthly.')
+    interval = info.get('interval', 1)
+    count = info.get('count')
+    if not isinstance(interval, int) or not 1 <= interval <= 1000:
+        raise ValueError('Invalid repeat. interval must be a whole number from 1 to 1000.')
+    if count is not None and (not isinstance(count, int) or not 1 <= count <= 10000):
+        raise ValueError('Invalid repeat. count must be a whole number from 1 to 10000.')
+    if count is not None and info.get('until') is not None:
+        raise ValueError('Invalid repeat. Please give either count or until, not both.')
+    until = None
+    if info.get('until') is not None:
+        until = parse_date(info['until'])
+        if until is None or until < date_iso:
+            raise ValueError('Invalid repeat. until must be a DD-MM-YYYY date on or after the first date.')
+    exdates = info.get('except', [])
+    if not isinstance(exdates, list) or any(parse_date(d) is None for d in exdates):
+        raise ValueError('Invalid repeat. except must be a list of DD-MM-YYYY dates.')
+    exdates = sorted({parse_date(d) for d in exdates})
+    rule = Series((None, None, date_iso, 0, 0) + (None,) * 6 + (info['freq'], interval, None, None, '[]'))
+    if count is not None:
+        # COUNT includes excluded dates, as in RFC 5545
+        last = next(itertools.islice(rule.dates(rule.start, datetime.date.max), count - 1, None), None)
+        if last is None:
+            raise ValueError('Invalid repeat. count runs past the year 9999.')
+        until = last.isoformat()
+    elif until is not None and next(itertools.islice(rule.dates(rule.start, to_date(until)), 10000, None), None):
+        # bounded series are expanded in full (statistics, overlap checks), so until is held to the same limit
+        raise ValueError('Invalid repeat. until allows more than 10000 occurrences; leave it out for no end.')
+    return info['freq'], interval, count, until, json.dumps(exdates)
+
+
+def series_between(first, last):
+    """Series with occurrences that may fall between the ISO dates `first` and `last`"""
+    rows = database.execute(f"SELECT {SERIES_COLUMNS} FROM series WHERE date_iso <= ? AND (until IS NULL OR until >= ?)",
+                            (last, first)).fetchall()
+    return [Series(row) for row in rows]
+
+
+def find_series_overlap(date_iso, start_min, end_min, exclude=None):
+    """Id of a series with an occurrence on that day intersecting [start_min, end_min), or None"""
+    rows = database.execute(f"SELECT {SERIES_COLUMNS} FROM series WHERE date_iso <= ? AND (until IS NULL OR until >= ?) "
+                            "AND start_min < ? AND end_min > ? AND id IS NOT ?",
+                            (date_iso, date_iso, end_min, start_min, exclude)).fetchall()
+    day = to_date(date_iso)
+    return next((row[0] for row in rows if Series(row).occurs_on(day)), None)
+
+
+def series_conflict(series):
+    """('event', id) or ('series', id) for the first stored event or other series one of `series`' occurrences
+    would overlap, or None. Events are checked exactly; other series up to the horizon."""
+    rows = database.execute("SELECT id, date_iso FROM events WHERE date_iso >= ? AND date_iso <= ? "
+                            "AND start_min < ? AND end_min > ? ORDER BY date_iso",
+                            (series.start.isoformat(), series.until.isoformat() if series.until else '9999-12-31',
+                             series.end_min, series.start_min))
+    for event_id, date_iso in rows:
+        if series.occurs_on(to_date(date_iso)):
+            return 'event', event_id
+    others = [s for s in series_between(series.start.isoformat(), series.end.isoformat())
+              if s.id != series.id and s.start_min < series.end_min and s.end_min > series.start_min]
+    if others:
+        for day in series.occurrences(series.start, max(other.end for other in others)):
+            for other in others:
+                if other.occurs_on(day):
+                    return 'series', other.id
+    return None
+
+
+class OrderKey:
+    """Sort key for rows merged in Python, comparing like SQLite's ORDER BY (NULLs first ascending, last descending)"""
+    __slots__ = ('values', 'descending')
+
+    def __init__(self, values, descending):
+        self.values = values
+        self.descending = descending
+
+    def __lt__(self, other):
+        for a, b, descending in zip(self.values, other.values, self.descending):
+            if a == b:
+                continue
+            if a is None or b is None:
+                return (a is None) != descending
+            return a > b if descending else a < b
+        return False
+
+
+def merge_occurrences(query, params, series, first, last, names, base, after=None, offset=0, limit=10):
+    """Rows `offset` to `offset + limit` of `query` (ordered by `base`) merged with the occurrences of `series`
+    between `first` and `last` (dates) projected onto the column `names` (sort values last), as (row, series id
+    or None) pairs. Each series is expanded only as far as the page needs."""
+    descending = [d for _, d in base]
+
+    def key(item):
+        return OrderKey(item[0][-len(base):], descending)
+
+    index = {c: i for i, c in enumerate(EVENT_COLUMNS.split(', '))}
+    positions = [index[name] for name in names]
+    # apart from the date an occurrence's sort values are the series' own, so each series already comes in order
+    reverse = dict(base)['date_iso']
+
+    def occurrences(s):
+        for day in s.occurrences(first, last, reverse):
+            row = s.event_row(day)
+            yield tuple(row[i] for i in positions), s.id
+
+    streams = [occurrences(s) for s in series]
+    if after is not None:
+        after = OrderKey(after, descending)
+        streams = [itertools.dropwhile(lambda item: not after < key(item), stream) for stream in streams]
+    stored = ((row, None) for row in database.execute(f"{query} LIMIT ?", params + [offset + limit]))
+    return list(itertools.islice(heapq.merge(stored, *streams, key=key), offset, offset + limit))
+
+
+# one keep-alive session shared by every upstream call
+http = requests.Session()
+http.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=32))
+http.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=32))
+
+
+class CircuitBreaker:
+    """Stops calling an upstream after `failures` errors in a row, then lets one trial call through every `reset` s"""
+
+    def __init__(self, failures=5, reset=30):
+        self.failures = failures
+        self.reset = reset
+        self._count = 0
+        self._opened = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self._opened is None:
+                return True
+            if time.monotonic() - self._opened >= self.reset:
+                self._opened = time.monotonic()
+                return True
+            return False
+
+    def record(self, ok):
+        with self._lock:
+            if ok:
+                self._count = 0
+                self._opened = None
+            else:
+                self._count += 1
+                if self._count >= self.failures:
+                    self._opened = time.monotonic()
+
+
+class SqliteStore:
+    """A sqlite file that every worker process reads and writes. The schema is created once, at construction, with
+    no connection left open (so instances can be built before a fork); each process then pools its own connections."""
+
+    SCHEMA = ()
+
+    def __init__(self, path, pool_size=16):
+        self.path = path
+        self._idle = queue.LifoQueue(pool_size)
+        db = self._connect()
+        try:
+            db.execute("PRAGMA journal_mode = WAL")  # persistent: stored in the file
+            for sql in self.SCHEMA:
+                db.execute(sql)
+        finally:
+            db.close()
+
+    @contextmanager
+    def _db(self):
+        """Borrow a pooled connection for one call"""
+        try:
+            db = self._idle.get_nowait()
+        except queue.Empty:
+            db = self._connect()
+        try:
+            yield db
+        finally:
+            try:
+                self._idle.put_nowait(db)
+            except queue.Full:
+                db.close()
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        db.execute("PRAGMA synchronous = OFF")
+        return db
+
+
+class SharedCache(SqliteStore):
+    """Second cache tier in a sqlite file that every worker process reads and writes: bytes with an expiry time"""
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS entries_expires ON entries (expires)",
+        # the last metrics snapshot of every worker process, dead ones included, so totals never go down
+        "CREATE TABLE IF NOT EXISTS metrics (worker TEXT PRIMARY KEY, snapshot TEXT NOT NULL)"
+    )
+
+    def get(self, key, name='shared'):
+        with self._db() as db:
+            row = db.execute("SELECT value FROM entries WHERE key = ? AND expires > ?", (key, time.time())).fetchone()
+        metrics.cache(name, row is not None)
+        return row and row[0]
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        with self._db() as db:
+            db.execute("INSERT OR REPLACE INTO entries (key, value, expires) VALUES (?, ?, ?)", (key, value, now + ttl))
+            db.execute("DELETE FROM entries WHERE expires <= ?", (now,))
+
+    def put_metrics(self, worker, snapshot):
+        with self._db() as db:
+            db.execute("INSERT OR REPLACE INTO metrics (worker, snapshot) VALUES (?, ?)", (worker, snapshot))
+
+    def all_metrics(self):
+        with self._db() as db:
+            return [row[0] for row in db.execute("SELECT snapshot FROM metrics")]
+
+    def clear_metrics(self):
+        with self._db() as db:
+            db.execute("DELETE FROM metrics")
+
+
+# set SHARED_CACHE (or use `serve`) so worker processes share holidays, forecasts and charts
+shared_cache = SharedCache(os.environ['SHARED_CACHE']) if os.environ.get('SHARED_CACHE') else None
+
+HOLIDAY_URL = os.environ.get('HOLIDAY_URL', 'https://date.nager.at/api/v2/publicholidays/{year}/AU')
+HOLIDAY_FALLBACK = os.environ.get('HOLIDAY_FALLBACK', 'holidays-fallback.json')
+
+
+class HolidayService:
+    """Australian public holidays, loaded once per year and indexed by date"""
+
+    def __init__(self, url=HOLIDAY_URL, fallback=HOLIDAY_FALLBACK, ttl=24 * 3600, retry=300, max_years=8):
+        self.url = url
+        self.fallback = fallback
+        self.ttl = ttl
+        self.retry = retry
+        self.max_years = max_years
+        self.breaker = CircuitBreaker()
+        self._years = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, day, state=None):
+        """Return the holiday name on the given date (for the given state, if any), or None"""
+        for name, states in self._year(day.year).get(day, ()):
+            if states is None or state is None or state.upper() in states:
+                return name
+        return None
+
+    def warm(self, years):
+        for year in years:
+            self._year(year)
+
+    def _year(self, year):
+        entry = self._years.get(year)
+        if entry is not None and entry[0] > time.time():
+            metrics.cache('holidays', True)
+            try:
+                self._years.move_to_end(year)
+            except KeyError:  # evicted by a concurrent load
+                pass
+            return entry[1]
+        metrics.cache('holidays', False)
+        with self._lock:
+            entry = self._years.get(year)
+            if entry is not None and entry[0] > time.time():
+                return entry[1]
+            holidays = None
+            if shared_cache is not None:
+                shared = shared_cache.get(f'holidays:{year}', 'holidays_shared')
+                holidays = shared and json.loads(shared)
+            if holidays is None:
+                holidays = self._fetch(year)
+            if holidays is not None:
+                entry = (time.time() + self.ttl, self._index(holidays))
+            elif entry is not None:
+                entry = (time.time() + self.retry, entry[1])
+            else:
+                entry = (time.time() + self.retry, {})
+            self._years[year] = entry
+            self._years.move_to_end(year)
+            while len(self._years) > self.max_years:
+                self._years.popitem(last=False)
+            return entry[1]
+
+    def _fetch(self, year):
+        holidays = None
+        if self.breaker.allow():
+            with metrics.timer('calendar_stage_seconds', stage='upstream_holidays'):
+                try:
+                    response = http.get(self.url.format(year=year), timeout=(2, 5))
+                    response.raise_for_status()
+                    holidays = response.json()
+                except (requests.RequestException, ValueError):
+                    pass
+            ok = isinstance(holidays, list)
+            self.breaker.record(ok)
+            metrics.inc('calendar_upstream_calls_total', source='holidays', outcome='ok' if ok else 'error')
+        else:
+            metrics.inc('calendar_upstream_calls_total', source='holidays', outcome='circuit_open')
+        if not isinstance(holidays, list):
+            holidays = self._read_fallback().get(str(year))
+            return holidays if isinstance(holidays, list) else None
+        self._write_fallback(year, holidays)
+        if shared_cache is not None:
+            shared_cache.set(f'holidays:{year}', json.dumps(holidays).encode(), self.ttl)
+        return holidays
+
+    @staticmethod
+    def _index(holidays):
+        index = {}
+        for e in holidays:
+            day = datetime.date.fromisoformat(e['date'])
+            counties = e.get('counties')
+            states = None if e.get('global', True) or not counties else {s.split('-')[-1] for s in counties}
+            index.setdefault(day, []).append((e['name'], states))
+        return index
+
+    def _read_fallback(self):
+        try:
+            with open(self.fallback) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_fallback(self, year, holidays):
+        data = self._read_fallback()
+        if data.get(str(year)) == holidays:
+            return
+        data[str(year)] = holidays
+        tmp = f'{self.fallback}.{os.getpid()}.tmp'  # workers of one deployment warm up at the same moment
+        try:
+            with open(tmp, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp, self.fallback)
+        except OSError:
+            pass
+
+
+holidays = HolidayService()
+
+# output field -> (selected column, sort expression); anything else is rejected before it reaches SQL
+EVENT_FIELDS = {
+    'id': ('id', 'id'),
+    'name': ('name', 'name'),
+    'date': ('date_iso', 'date_iso'),
+    'from': ('start_min', 'start_min'),
+    'to': ('end_min', 'end_min'),
+    'street': ('street', 'street'),
+    'suburb': ('suburb', 'suburb'),
+    'state': ('state', 'state'),
+    'post_code': ('post_code', 'post_code'),
+    'description': ('description', 'description'),
+    'last_update': ('last_update', 'last_update')
+}
+FIELD_FORMATS = {'date': format_date, 'from': format_time, 'to': format_time}
+
+
+def parse_order(order):
+    """'+date,-name' -> [('date_iso', False), ('name', True), ('id', False)]; raises KeyError on unknown fields"""
+    base = []
+    for key in order.split(','):
+        # a literal '+' arrives as a space when it is not URL-encoded
+        descending = key.startswith('-')
+        key = key.lstrip('+- ')
+        base.append((EVENT_FIELDS[key][1], descending))
+    if ('id', False) not in base and ('id', True) not in base:
+        base.append(('id', False))
+    return base
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    return json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+
+
+def keyset_after(base, values):
+    """WHERE clause selecting rows strictly after `values` in the `base` ordering (NULLs sort first, as in SQLite)"""
+    clauses = []
+    params = []
+    for i, (expr, descending) in enumerate(base):
+        parts = [f"{e} IS ?" for e, _ in base[:i]]
+        p = list(values[:i])
+        value = values[i]
+        if value is None:
+            if descending:
+                continue
+            parts.append(f"{expr} IS NOT NULL")
+        elif descending:
+            parts.append(f"({expr} < ? OR {expr} IS NULL)")
+            p.append(value)
+        else:
+            parts.append(f"{expr} > ?")
+            p.append(value)
+        clauses.append(f"({' AND '.join(parts)})")
+        params.extend(p)
+    return f"({' OR '.join(clauses) or '0'})", params
+
+
+GEO_CSV = os.environ.get('GEO_CSV', 'georef-australia-state-suburb.csv')
+GEO_INDEX = os.environ.get('GEO_INDEX', 'georef-australia-state-suburb.idx')
+STATE_MAP = {
+    'New South Wales': 'NSW',
+    'Victoria': 'VIC',
+    'Queensland': 'QLD',
+    'Western Australia': 'WA',
+    'South Australia': 'SA',
+    'Tasmania': 'TAS',
+    'Northern Territory': 'NT',
+    'Australian Capital Territory': 'ACT'
+}
+
+
+def geo_key(suburb, state):
+    """Normalised index key, e.g. ('North Sydney (NSW)', 'nsw') -> b'NSW|north sydney'"""
+    suburb = suburb.strip().lower()
+    if suburb.endswith(')') and '(' in suburb:
+        suburb = suburb[:suburb.rindex('(')]
+    key = f"{state.strip().upper()}|{' '.join(suburb.split())}"
+    return key.encode('utf-8')[:GeoIndex.RECORD.size - 16]
+
+
+class GeoIndex:
+    """Sorted (state, suburb) -> (lat, lng) records in a memory-mapped file, built once from the georef CSV"""
+    MAGIC = b'GEO1'
+    RECORD = struct.Struct('<48sdd')
+
+    def __init__(self, path=GEO_INDEX, source=GEO_CSV, fuzzy=True):
+        self.path = path
+        self.source = source
+        self.fuzzy = fuzzy
+        self._mm = None
+        self._count = 0
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, suburb, state):
+        """Return (lat, lng) for a suburb: exact match first, then prefix, then (optionally) fuzzy"""
+        if not self.load():
+            return None
+        with metrics.timer('calendar_stage_seconds', stage='geo'):
+            return self._lookup(suburb, state)
+
+    def _lookup(self, suburb, state):
+        key = geo_key(suburb, state)
+        i = self._lower_bound(key)
+        if i < self._count:
+            k, lat, lng = self._record(i)
+            if k == key or k.startswith(key):
+                return lat, lng
+        if self.fuzzy:
+            names = self._state_names(key.split(b'|', 1)[0] + b'|')
+            match = difflib.get_close_matches(key, names, n=1, cutoff=0.85)
+            if match:
+                return self._record(names[match[0]])[1:]
+        return None
+
+    @classmethod
+    def build(cls, source, path):
+        records = {}
+        with open(source, newline='', encoding='utf-8') as f:
+            for line in csv.DictReader(f, delimiter=';'):
+                state = STATE_MAP.get(line['Official Name State'], line['Official Name State'])
+                try:
+                    lat, lng = (float(v) for v in line['Geo Point'].split(','))
+                except ValueError:
+                    continue
+                records.setdefault(geo_key(line['Official Name Suburb'], state), (lat, lng))
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(cls.MAGIC + struct.pack('<I', len(records)))
+            for key in sorted(records):
+                f.write(cls.RECORD.pack(key, *records[key]))
+        os.replace(tmp, path)
+
+    def load(self):
+        if self._mm is not None:
+            return True
+        with self._lock:
+            if self._mm is not None:
+                return True
+            try:
+                if not os.path.exists(self.path) or (
+                        os.path.exists(self.source) and os.path.getmtime(self.source) > os.path.getmtime(self.path)):
+                    self.build(self.source, self.path)
+                with open(self.path, 'rb') as f:
+                    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError, KeyError):
+                return False
+            if mm[:4] != self.MAGIC:
+                mm.close()
+                return False
+            self._count = struct.unpack('<I', mm[4:8])[0]
+            self._mm = mm
+            return True
+
+    def _record(self, i):
+        k, lat, lng = self.RECORD.unpack_from(self._mm, 8 + i * self.RECORD.size)
+        return k.rstrip(b'\0'), lat, lng
+
+    def _lower_bound(self, key):
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._record(mid)[0] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _state_names(self, prefix):
+        names = self._states.get(prefix)
+        if names is None:
+            names = {}
+            i = self._lower_bound(prefix)
+            while i < self._count:
+                k = self._record(i)[0]
+                if not k.startswith(prefix):
+                    break
+                names[k] = i
+                i += 1
+            self._states[prefix] = names
+        return names
+
+
+geo = GeoIndex()
+
+WEATHER_URL = os.environ.get('WEATHER_URL', 'https://www.7timer.info/bin/civil.php')
+STATE_TZ = {
+    'NSW': 'Australia/Sydney',
+    'VIC': 'Australia/Melbourne',
+    'QLD': 'Australia/Brisbane',
+    'WA': 'Australia/Perth',
+    'SA': 'Australia/Adelaide',
+    'TAS': 'Australia/Hobart',
+    'NT': 'Australia/Darwin',
+    'ACT': 'Australia/Sydney'
+}
+
+
+def state_tz(state):
+    try:
+        return ZoneInfo(STATE_TZ.get(state.strip().upper(), 'Australia/Sydney'))
+    except ZoneInfoNotFoundError:
+        return datetime.timezone(datetime.timedelta(hours=10))
+
+
+class ForecastCache:
+    """7timer forecasts cached per grid cell and forecast cycle; concurrent misses share one upstream request"""
+
+    def __init__(self, url=WEATHER_URL, precision=1, cycle=6 * 3600, max_cells=1024, wait=10):
+        self.url = url
+        self.precision = precision
+        self.cycle = cycle
+        self.max_cells = max_cells
+        self.wait = wait
+        self.breaker = CircuitBreaker()
+        self._cells = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def forecast(self, lat, lng, when):
+        """Return the dataseries entry closest to the (timezone-aware) datetime, or None"""
+        data = self._get(lat, lng)
+        if not data:
+            return None
+        init = datetime.datetime.strptime(data['init'], '%Y%m%d%H').replace(tzinfo=datetime.timezone.utc)
+        hours = (when - init).total_seconds() / 3600
+        best = min(data['dataseries'], key=lambda e: abs(e['timepoint'] - hours), default=None)
+        if best is None or abs(best['timepoint'] - hours) > 3:
+            return None
+        return best
+
+    def _get(self, lat, lng):
+        now = time.time()
+        key = (round(float(lat), self.precision), round(float(lng), self.precision), int(now // self.cycle))
+        with self._lock:
+            entry = self._cells.get(key)
+            metrics.cache('forecasts', entry is not None)
+            if entry is not None:
+                self._cells.move_to_end(key)
+                return entry
+            pending = self._pending.get(key)
+            leader = pending is None
+            if leader:
+                pending = self._pending[key] = threading.Event()
+        if not leader:
+            pending.wait(self.wait)
+            return self._cells.get(key)
+
+        data = None
+        shared_key = f'forecast:{key[0]}:{key[1]}:{key[2]}'
+        try:
+            if shared_cache is not None:
+                shared = shared_cache.get(shared_key, 'forecasts_shared')
+                data = shared and json.loads(shared)
+            if not data:
+                data = self._fetch(key[0], key[1])
+                if data and shared_cache is not None:
+                    shared_cache.set(shared_key, json.dumps(data).encode(), self.cycle)
+        finally:
+            with self._lock:
+                if data:
+                    self._cells[key] = data
+                    for k in [k for k in self._cells if k[2] < key[2]]:
+                        del self._cells[k]
+                    while len(self._cells) > self.max_cells:
+                        self._cells.popitem(last=False)
+                del self._pending[key]
+            pending.set()
+        return data
+
+    def _fetch(self, lat, lng):
+        if not self.breaker.allow():
+            metrics.inc('calendar_upstream_calls_total', source='forecasts', outcome='circuit_open')
+            return None
+        data = None
+        with metrics.timer('calendar_stage_seconds', stage='upstream_forecasts'):
+            try:
+                response = http.get(self.url, params={'lat': lat, 'lng': lng, 'ac': 1, 'unit': 'metric',
+                                                      'output': 'json', 'product': 'two'}, timeout=(2, 10))
+                response.raise_for_status()
+                data = response.json()
+            except (requests.RequestException, ValueError):
+                pass
+        ok = isinstance(data, dict) and 'init' in data and bool(data.get('dataseries'))
+        self.breaker.record(ok)
+        metrics.inc('calendar_upstream_calls_total', source='forecasts', outcome='ok' if ok else 'error')
+        return data if ok else None
+
+
+forecasts = ForecastCache()
+
+
+def batch_holidays(rows):
+    """{(date, state): holiday name} with one lookup per distinct pair"""
+    return {(row[2], row[7]): holidays.lookup(to_date(row[2]), row[7]) for row in rows if row[2]}
+
+
+def batch_weather(point, rows):
+    """{(event id, date, start): forecast slot} for events at one location; only the first row can miss the
+    forecast cache. Series occurrences have no id of their own, hence the longer key."""
+    result = {}
+    for row in rows:
+        start = datetime.datetime.combine(to_date(row[2]), datetime.time(row[3] // 60, row[3] % 60), state_tz(row[7]))
+        result[row[0], row[2], row[3]] = forecasts.forecast(point[0], point[1], start)
+    return result
+
+
+def batch_neighbours(rows, contiguous=False):
+    """{event id: (previous id, next id)}.
+
+    When `rows` is a contiguous slice of the (date, start time, id) ordering, the neighbours are found in one pass
+    and only the two ends need a query; otherwise each row does its own indexed lookup.
+    """
+    if not contiguous:
+        return {row[0]: neighbours(row[2], row[3], row[0]) for row in rows}
+    rows = sorted(rows, key=lambda r: (r[2], r[3], r[0]))
+    result = {}
+    for i, row in enumerate(rows):
+        previous_event = rows[i - 1][0] if i > 0 else neighbours(row[2], row[3], row[0])[0]
+        next_event = rows[i + 1][0] if i + 1 < len(rows) else neighbours(row[2], row[3], row[0])[1]
+        result[row[0]] = (previous_event, next_event)
+    return result
+
+
+# seconds each source may take before an event is answered without it
+ENRICH_DEADLINES = {'holiday': 2.0, 'weather': 3.0, 'neighbours': 2.0}
+enrich_pool = ThreadPoolExecutor(int(os.environ.get('ENRICH_WORKERS', 16)), thread_name_prefix='enrich')
+
+
+def _pooled(fn, *args):
+    try:
+        return fn(*args)
+    finally:
+        database.release()
+
+
+def enrich(tasks):
+    """Run {source: (fn, args)} concurrently on the shared pool; a source may also be a (source, key) tuple.
+
+    Returns the results that arrived within each source's deadline and the list of sources that did not.
+    A late call keeps running in the background and still fills its cache for the next request.
+    """
+    start = time.monotonic()
+    futures = {name: enrich_pool.submit(_pooled, fn, *args) for name, (fn, args) in tasks.items()}
+    results = {}
+    missing = []
+    for name, future in futures.items():
+        try:
+            deadline = ENRICH_DEADLINES[name[0] if isinstance(name, tuple) else name]
+            results[name] = future.result(max(0.0, deadline - (time.monotonic() - start)))
+        except Exception:
+            missing.append(name)
+    return results, missing
+
+
+def expand_events(rows, contiguous=False):
+    """The Event.get representation of each row, sharing one holiday lookup per date, one forecast per location
+    and one neighbour pass across the whole batch"""
+    today = datetime.date.today()
+    groups = {}
+    for row in rows:
+        if row[2] and row[3] is not None and 1 <= (to_date(row[2]) - today).days <= 7:
+            point = geo.lookup(row[6], row[7])
+            if point is not None:
+                groups.setdefault(point, []).append(row)
+    tasks = {
+        'holiday': (batch_holidays, (rows,)),
+        'neighbours': (batch_neighbours, ([row for row in rows if row[0] is not None], contiguous))
+    }
+    for point, group in groups.items():
+        tasks[('weather', point)] = (batch_weather, (point, group))
+    with metrics.timer('calendar_stage_seconds', stage='enrich'):
+        results, missing = enrich(tasks)
+    if missing:
+        g.partial = True
+
+    weather = {}
+    weather_missing = set()
+    for point, group in groups.items():
+        if ('weather', point) in results:
+            weather.update(results[('weather', point)])
+        else:
+            weather_missing.update((row[0], row[2], row[3]) for row in group)
+    holiday = results.get('holiday', {})
+    links = results.get('neighbours', {})
+    events = []
+    for row in rows:
+        unavailable = [name for name in ('holiday', 'neighbours') if name in missing]
+        if (row[0], row[2], row[3]) in weather_missing:
+            unavailable.append('weather')
+        events.append(event_detail(row, holiday.get((row[2], row[7])), weather.get((row[0], row[2], row[3])),
+                                   *links.get(row[0], (None, None)), unavailable))
+    return events
+
+
+def event_detail(row, holi_d, weather, previous_event, next_event, unavailable=()):
+    event_date = to_date(row[2])
+    links = {"self": {"href": f"/events/{row[0]}"}}
+    if previous_event:
+        links["previous"] = {"href": f"/events/{previous_event}"}
+    if next_event:
+        links["next"] = {"href": f"/events/{next_event}"}
+
+    metadata = {}
+    if weather is not None:
+        metadata = {
+            "wind-speed": f"{weather['wind10m']}{' The speed unit is KM.'}",
+            "weather": f"{weather['weather']}",
+            "humidity": f"{weather['rh2m']}",
+            "temperature": f"{weather['temp2m']}C"
+        }
+    metadata.update({"holiday": holi_d, "weekend": event_date is not None and event_date.weekday() >= 5})
+    if unavailable:
+        metadata["unavailable"] = list(unavailable)
+
+    return {
+        'id': row[0],
+        "last-update": row[10],
+        'name': row[1],
+        'date': format_date(row[2]),
+        'from': format_time(row[3]),
+        'to': format_time(row[4]),
+        'location': {
+            'street': row[5],
+            'suburb': row[6],
+            'state': row[7],
+            'post-code': row[8]
+        },
+        'description': row[9],
+        "_metadata": metadata,
+        "_links": links
+    }
+
+
+class MemoryResponseCache:
+    """In-process LRU of response bodies, bounded by their total size in bytes"""
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._bodies = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._bodies.get(key)
+            if body is not None:
+                self._bodies.move_to_end(key)
+            return body
+
+    def set(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._bodies.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._bodies[key] = body
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                self._size -= len(self._bodies.popitem(last=False)[1])
+
+
+class SqliteResponseCache(SqliteStore):
+    """Response bodies in a sqlite file, so every worker process shares them; least recently used go first"""
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS responses "
+        "(key TEXT PRIMARY KEY, body BLOB NOT NULL, size INTEGER NOT NULL, used REAL NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS responses_used ON responses (used)"
+    )
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024):
+        super().__init__(path)
+        self.max_bytes = max_bytes
+
+    def get(self, key):
+        with self._db() as db:
+            row = db.execute("SELECT body, used FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            # refreshing the LRU clock is a write, so do it at most once a minute per entry
+            if time.time() - row[1] > 60:
+                db.execute("UPDATE responses SET used = ? WHERE key = ?", (time.time(), key))
+        return row[0]
+
+    def set(self, key, body):
+        with self._db() as db:
+            db.execute("INSERT OR REPLACE INTO responses (key, body, size, used) VALUES (?, ?, ?, ?)",
+                       (key, body, len(body), time.time()))
+            if db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0] > self.max_bytes:
+                db.execute("DELETE FROM responses WHERE key IN "
+                           "(SELECT key FROM responses ORDER BY used LIMIT (SELECT COUNT(*) / 4 + 1 FROM responses))")
+
+
+def make_response_cache(spec=os.environ.get('RESPONSE_CACHE', 'memory'),
+                        max_bytes=int(os.environ.get('RESPONSE_CACHE_BYTES', 32 * 1024 * 1024))):
+    """'memory', 'sqlite:<path>' or 'none'"""
+    if spec == 'none':
+        return None
+    if spec.startswith('sqlite:'):
+        return SqliteResponseCache(spec[len('sqlite:'):], max_bytes)
+    return MemoryResponseCache(max_bytes)
+
+
+response_cache = make_response_cache()
+
+
+def cached_get(validator=None):
+    """Serve a GET from response_cache with a strong ETag.
+
+    The key covers the scheme and host (listings link absolutely), the route, the query string, the data version
+    (bumped by triggers on every write), today's date and the forecast cycle, so entries never need explicit
+    invalidation. `validator(*args)` adds a per-resource part
+    such as an event's last_update; when it returns None the view runs uncached (e.g. to produce its 404).
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            parts = [request.host_url, request.path, sorted(request.args.items(multi=True)), data_version(),
+                     datetime.date.today().isoformat(), int(time.time() // forecasts.cycle)]
+            if validator is not None:
+                part = validator(*args, **kwargs)
+                if part is None:
+                    return fn(self, *args, **kwargs)
+                parts.append(part)
+            etag = hashlib.sha1(repr(parts).encode()).hexdigest()
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+                response.set_etag(etag)
+                return response
+
+            body = response_cache.get(etag) if response_cache is not None else None
+            metrics.cache('responses', body is not None)
+            if body is None:
+                result = fn(self, *args, **kwargs)
+                if not isinstance(result, tuple) or result[1] != 200:
+                    return result
+                body = json.dumps(result[0]).encode()
+                # a response missing an upstream source must not be pinned, neither here nor by the client
+                if g.get('partial'):
+                    return Response(body, mimetype='application/json')
+                if response_cache is not None:
+                    response_cache.set(etag, body)
+            response = Response(body, mimetype='application/json')
+            response.set_etag(etag)
+            return response
+        return wrapper
+    return decorator
+
+
+def event_last_update(event_id):
+    row = database.execute("SELECT last_update FROM events WHERE id = ?", (event_id,)).fetchone()
+    return row and (event_id, row[0])
+
 
 event = api.model('Event', {
     'name': fields.String(required=True, description='Event name'),
@@ -59,52 +1540,21 @@ class EventList(Resource):
     @api.expect(event)
     def post(self):
         """Create a new event"""
-        info = request.get_json()
-
-        name = info['name']
-        date_s = info['date']
         try:
-            date_c = datetime.datetime.strptime(date_s, '%d-%m-%Y')
-            date = datetime.datetime.strftime(date_c, '%d-%m-%Y')
-        except ValueError:
-            return {'message': 'Invalid date input. Please follow the format: DD-MM-YYYY.'}, 400
-
-        try:
-            start_time = datetime.datetime.strptime(info['from'], '%H:%M:%S').strftime('%H:%M')
-        except ValueError:
-            try:
-                start_time = datetime.datetime.strptime(info['from'], '%H:%M').strftime('%H:%M')
-            except ValueError:
-                return {'message': 'Invalid time input. Please follow the format: HH:MM or HH:MM:SS.'}, 400
-
-        try:
-            end_time = datetime.datetime.strptime(info['to'], '%H:%M:%S').strftime('%H:%M')
-        except ValueError:
-            try:
-                end_time = datetime.datetime.strptime(info['to'], '%H:%M').strftime('%H:%M')
-            except ValueError:
-                return {'message': 'Invalid time input. Please follow the format: HH:MM or HH:MM:SS.'}, 400
-
-        street = info['location']['street']
-        suburb = info['location']['suburb']
-        state = info['location']['state']
-        post_code = info['location']['post-code']
-        description = info.get('description')
-
-        q = "SELECT * FROM events WHERE date = ?"
-        c.execute(q, (info['date'],))
-        all_event = c.fetchall()
-        for e in all_event:
-            if (start_time < e[4] and end_time > e[3]) or (start_time < e[3] and end_time > e[4]) or (
-                    start_time >= e[3] and start_time < e[4]) or (end_time > e[3] and end_time <= e[4]):
-                return {'message': 'The event overlaps with another event'}, 400
+            row = parse_event(request.get_json())
+        except ValueError as e:
+            return {'message': str(e)}, 400
+        date_iso, start_min, end_min = row[1], row[2], row[3]
 
         last_update = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        q = f"INSERT INTO events (name, date, start_time, end_time, street, suburb, state, post_code, description, last_update) VALUES ('{name}', '{date}', '{start_time}', '{end_time}', '{street}', '{suburb}', '{state}', '{post_code}', '{description}', '{last_update}')"
-        c.execute(q)
-
-        conn.commit()
-        event_id = c.lastrowid
+        # the write lock is taken before the overlap check so concurrent writers cannot both pass it
+        with database.transaction() as db:
+            if find_overlap(date_iso, start_min, end_min):
+                return {'message': 'The event overlaps with another event'}, 400
+            series_id = find_series_overlap(date_iso, start_min, end_min)
+            if series_id:
+                return {'message': f'The event overlaps with recurring event {series_id}'}, 400
+            event_id = db.execute(INSERT_EVENT, row + (last_update,)).lastrowid
         response = {
             'id': event_id,
             'last-update': last_update,
@@ -124,79 +1574,338 @@ class EventList(Resource):
     @api.param('page', 'Page number that shows in user interface (default: 1)')
     @api.param('size', 'Number of events per page (default: 10)')
     @api.param('filter', 'Comma separated value that what user want to know for each event (default: id,name)')
+    @api.param('cursor', 'Opaque cursor from a previous response, continues after its last event (overrides page)')
+    @api.param('from', 'Only events on or after this date, format: dd-mm-yyyy; '
+                       'with from or to, occurrences of recurring events in that range are listed too')
+    @api.param('to', 'Only events on or before this date, format: dd-mm-yyyy')
+    @api.param('expand', 'metadata: return each event as GET /events/<id> does (filter is ignored)')
+    @cached_get()
     def get(self):
         """Get all available events"""
-        c.execute("SELECT * FROM events")
-        r = c.fetchall()
-        event_l = []
-        for e in r:
-            single_event = {
-                "id": e[0],
-                "name": e[1],
-                "date": e[2],
-                "from": e[3],
-                "to": e[4],
-                "street": e[5],
-                "suburb": e[6],
-                "state": e[7],
-                "post_code": e[8],
-                "description": e[9],
-                "last_update": e[10]
-            }
-
-            event_l.append(single_event)
         try:
             order = request.args.get("order", "+id")
             n_p = int(request.args.get("page", 1))
             size = int(request.args.get("size", 10))
             condi = request.args.get("filter", "id,name")
             condition = condi.split(',')
+            cursor = request.args.get("cursor")
+            expand = request.args.get("expand") == "metadata"
+            first = parse_date(request.args.get("from", "01-01-0001"))
+            last = parse_date(request.args.get("to", "31-12-9999"))
+            if n_p < 1 or size < 1 or first is None or last is None:
+                raise ValueError
         except (ValueError):
             return {"message": "Invalid Input"}, 400
         except (KeyError):
             return {"message": "Invalid Input"}, 400
 
         try:
-            filtered_events = []
-            for data in event_l:
-                filtered_data = {}
-                for field in condition:
-                    filtered_data[field] = data[field]
-                filtered_events.append(filtered_data)
+            if expand:
+                condition = [None] * len(EVENT_COLUMNS.split(', '))
+                columns = [EVENT_COLUMNS]
+            else:
+                columns = [EVENT_FIELDS[field][0] for field in condition]
         except KeyError:
             return {"message": "Invalid filter input, may contains space, symbol etc. Please follow the format that it is comma sperated and with no space."}, 400
+        try:
+            base = parse_order(order)
+        except KeyError:
+            return {"message": "Invalid order input. Please use comma separated fields prefixed with + or -, e.g. +date,-name."}, 400
 
-        order_l = order.split(",")
-        base = []
-        for key in order_l:
-            if key.startswith("-"):
-                base.append((key[1:], True))
-            elif key.startswith("+"):
-                base.append((key[1:], False))
+        ranged = "from" in request.args or "to" in request.args
+        if ranged:
+            # occurrences of a series all have a NULL id; their date and start time keep the order total
+            sorted_by = [expr for expr, _ in base]
+            base += [(expr, False) for expr in ('date_iso', 'start_min') if expr not in sorted_by]
+        clauses = []
+        params = []
+        if ranged:
+            clauses.append("date_iso BETWEEN ? AND ?")
+            params += [first, last]
+        if cursor:
+            try:
+                values = decode_cursor(cursor)
+                if not isinstance(values, list) or len(values) != len(base) or \
+                        not all(v is None or isinstance(v, (int, float, str)) for v in values):
+                    raise ValueError
+            except ValueError:
+                return {"message": "Invalid cursor"}, 400
+            clause, p = keyset_after(base, values)
+            clauses.append(clause)
+            params += p
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        select = ", ".join(columns + [expr for expr, _ in base])
+        order_by = ", ".join(f"{expr} {'DESC' if descending else 'ASC'}" for expr, descending in base)
+        q = f"SELECT {select} FROM events{where} ORDER BY {order_by}"
+        series = series_between(first, last) if ranged else []
+        if series:
+            names = (EVENT_COLUMNS.split(', ') if expand else columns) + [expr for expr, _ in base]
+            merged = merge_occurrences(q, params, series, to_date(first), to_date(last), names, base,
+                                       values if cursor else None, 0 if cursor else (n_p - 1) * size, size + 1)
+            rows = [row for row, _ in merged]
+            sources = [series_id for _, series_id in merged]
+        else:
+            q += " LIMIT ?"
+            params.append(size + 1)
+            if not cursor:
+                q += " OFFSET ?"
+                params.append((n_p - 1) * size)
+            rows = database.execute(q, params).fetchall()
+            sources = [None] * len(rows)
+        if ranged:
+            total = count_between(datetime.date.fromisoformat(first), datetime.date.fromisoformat(last))
+        else:
+            total = database.execute("SELECT value FROM counters WHERE name = 'events'").fetchone()[0]
 
-        sorted_events = sorted(filtered_events, key=lambda event: [event.get(key, None) for key, reverse in base],
-                               reverse=base[-1][1])
+        more = len(rows) > size
+        rows = rows[:size]
+        width = len(condition)
+        if expand:
+            chronological = base == [('date_iso', False), ('start_min', False), ('id', False)]
+            show = expand_events([r[:width] for r in rows], contiguous=chronological)
+        else:
+            show = [{field: FIELD_FORMATS[field](value) if field in FIELD_FORMATS else value
+                     for field, value in zip(condition, r[:width])} for r in rows]
+        for e, series_id in zip(show, sources):
+            if series_id is not None:
+                e['series'] = series_id
+                if expand:
+                    e['_links'] = {'self': {'href': f'/series/{series_id}'}}
+        next_cursor = encode_cursor(list(rows[-1][width:])) if more and rows else None
+        condi += "".join(f"&{k}={request.args[k]}" for k in ("from", "to", "expand") if k in request.args)
 
-        begin = (n_p - 1) * size
-        last = begin + size
-        show = sorted_events[begin:last]
         next = None
         previous = None
-        if last < len(sorted_events):
-            next = f"{request.base_url}?order={order}&page={n_p + 1}&size={size}&filter={condi}"
-        if begin > 1:
-            previous = f"{request.base_url}?order={order}&page={n_p - 1}&size={size}&filter={condi}"
+        if more:
+            if cursor:
+                next = f"{request.base_url}?order={quote(order, safe=',')}&size={size}&filter={condi}&cursor={next_cursor}"
+            else:
+                next = f"{request.base_url}?order={quote(order, safe=',')}&page={n_p + 1}&size={size}&filter={condi}"
+        if n_p > 1 and not cursor:
+            previous = f"{request.base_url}?order={quote(order, safe=',')}&page={n_p - 1}&size={size}&filter={condi}"
         links = {"self": {"href": request.full_path}}
         if previous:
             links["previous"] = {"href": previous}
         if next:
             links["next"] = {"href": next}
+        response = {
+            "page": n_p,
+            "page-size": size,
+            "total": total,
+            "events": show,
+            "_links": links,
+        }
+        if next_cursor:
+            response["next-cursor"] = next_cursor
+        return response, 200
+
+
+slot = api.model('Slot', {
+    'date': fields.String(required=True, description='Slot date, format: dd-mm-yyyy'),
+    'from': fields.String(required=True, description='Slot start time, format: hh:mm'),
+    'to': fields.String(required=True, description='Slot end time, format: hh:mm')
+})
+
+
+@api.route('/events/availability')
+class Availability(Resource):
+    @api.doc('check_slots')
+    @api.response(200, 'Success')
+    @api.response(400, 'Bad Request')
+    @api.expect(api.model('Slots', {'slots': fields.List(fields.Nested(slot), required=True)}))
+    def post(self):
+        """Check many candidate slots at once, against existing events and each other"""
+        info = request.get_json()
+        if not isinstance(info, dict) or not isinstance(info.get('slots'), list):
+            return {'message': 'Invalid Input'}, 400
+
+        checker = SlotChecker()
+        results = []
+        for i, s in enumerate(info['slots']):
+            if not isinstance(s, dict):
+                return {'message': f'Invalid slot {i}. A slot needs date, from and to.'}, 400
+            date_iso = parse_date(s.get('date'))
+            start_min = parse_time(s.get('from'))
+            end_min = parse_time(s.get('to'))
+            if date_iso is None or start_min is None or end_min is None:
+                return {'message': f'Invalid slot {i}. Please follow the formats DD-MM-YYYY and HH:MM.'}, 400
+            if start_min >= end_min:
+                return {'message': f'Invalid slot {i}. A slot must end after it starts.'}, 400
+            result = {'date': s['date'], 'from': format_time(start_min), 'to': format_time(end_min), 'available': True}
+            hit = checker.check(date_iso, start_min, end_min, ref=i)
+            if hit is not None:
+                result['available'] = False
+                if hit[0] == 'event':
+                    result['conflict'] = f'/events/{hit[1]}'
+                elif hit[0] == 'series':
+                    result['conflict'] = f'/series/{hit[1]}'
+                else:
+                    result['conflict'] = f'slot {hit[1]}'
+            results.append(result)
+        return {'slots': results}, 200
+
+
+@api.route('/events/bulk')
+class BulkImport(Resource):
+    chunk_size = 500
+
+    @api.doc('import_events')
+    @api.response(200, 'Success')
+    @api.response(400, 'Bad Request')
+    @api.param('format', 'ndjson (one POST /events body per line, default) or csv '
+                         '(header: name,date,from,to,street,suburb,state,post_code,description)')
+    def post(self):
+        """Import events from a streamed NDJSON or CSV body, committed in chunks"""
+        f_t = request.args.get('format')
+        if f_t is None:
+            f_t = 'csv' if request.mimetype == 'text/csv' else 'ndjson'
+        if f_t not in ('ndjson', 'csv'):
+            return {'message': 'Invalid format. Please use ndjson or csv.'}, 400
+
+        if f_t == 'csv':
+            numbered = self._csv_records(request.stream)
+        else:
+            numbered = ((n, raw) for n, raw in enumerate(request.stream, 1) if raw.strip())
+
+        inserted = 0
+        errors = []
+        chunk = []
+        for n, record in numbered:
+            try:
+                if isinstance(record, ValueError):
+                    raise record
+                if f_t == 'ndjson':
+                    try:
+                        record = json.loads(record.decode('utf-8'))
+                    except UnicodeDecodeError:
+                        raise ValueError('Invalid UTF-8.')
+                    except ValueError:
+                        raise ValueError('Invalid JSON.')
+                chunk.append((n, parse_event(record)))
+            except ValueError as e:
+                errors.append({'line': n, 'message': str(e)})
+            if len(chunk) >= self.chunk_size:
+                inserted += self._flush(chunk, errors)
+                chunk = []
+        if chunk:
+            inserted += self._flush(chunk, errors)
+        errors.sort(key=lambda e: e['line'])
+        return {'inserted': inserted, 'failed': len(errors), 'errors': errors}, 200
+
+    @staticmethod
+    def _csv_records(stream):
+        """(line, POST /events body) per CSV row, or (line, ValueError) for a row that cannot be read"""
+        # bad bytes are kept as surrogates so one row fails, not the whole upload
+        reader = csv.DictReader(raw.decode('utf-8', 'surrogateescape') for raw in stream)
+        rows = iter(reader)
+        while True:
+            try:
+                r = next(rows)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                yield reader.reader.line_num, ValueError(f'Invalid CSV: {e}.')
+                continue
+            try:
+                ''.join(v for v in r.values() if isinstance(v, str)).encode('utf-8')
+            except UnicodeEncodeError:
+                yield reader.reader.line_num, ValueError('Invalid UTF-8.')
+                continue
+            yield reader.reader.line_num, {
+                'name': r.get('name'), 'date': r.get('date'), 'from': r.get('from'), 'to': r.get('to'),
+                'location': {'street': r.get('street'), 'suburb': r.get('suburb'), 'state': r.get('state'),
+                             'post-code': r.get('post_code')},
+                'description': r.get('description') or None
+            }
+
+    @staticmethod
+    def _flush(chunk, errors):
+        """Overlap-check and insert one chunk in a single transaction; returns the number of rows inserted"""
+        last_update = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        with database.transaction() as db:
+            checker = SlotChecker()
+            accepted = []
+            for n, row in chunk:
+                hit = checker.check(row[1], row[2], row[3], ref=n)
+                if hit is None:
+                    accepted.append(row + (last_update,))
+                elif hit[0] == 'event':
+                    errors.append({'line': n, 'message': f'The event overlaps with event {hit[1]}'})
+                elif hit[0] == 'series':
+                    errors.append({'line': n, 'message': f'The event overlaps with recurring event {hit[1]}'})
+                else:
+                    errors.append({'line': n, 'message': f'The event overlaps with the event on line {hit[1]}'})
+            db.executemany(INSERT_EVENT, accepted)
+        return len(accepted)
+
+
+@api.route('/events/export')
+class Export(Resource):
+    @api.doc('export_events')
+    @api.response(200, 'Success')
+    @api.response(400, 'Bad Request')
+    @api.param('format', 'ndjson (default) or csv')
+    def get(self):
+        """Stream every event as NDJSON or CSV"""
+        f_t = request.args.get('format', 'ndjson')
+        if f_t not in ('ndjson', 'csv'):
+            return {'message': 'Invalid format. Please use ndjson or csv.'}, 400
+
+        def generate():
+            cursor = database.execute(f"SELECT {EVENT_COLUMNS} FROM events ORDER BY id")
+            buf = StringIO()
+            writer = csv.writer(buf)
+            if f_t == 'csv':
+                writer.writerow(EXPORT_COLUMNS)
+            while True:
+                rows = cursor.fetchmany(500)
+                if not rows:
+                    break
+                for r in rows:
+                    if f_t == 'csv':
+                        writer.writerow((r[0], r[1], format_date(r[2]), format_time(r[3]), format_time(r[4])) + r[5:])
+                    else:
+                        buf.write(json.dumps({
+                            'id': r[0], 'name': r[1], 'date': format_date(r[2]), 'from': format_time(r[3]),
+                            'to': format_time(r[4]),
+                            'location': {'street': r[5], 'suburb': r[6], 'state': r[7], 'post-code': r[8]},
+                            'description': r[9], 'last-update': r[10]}) + '\n')
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+            cursor.close()
+
+        mimetype = 'text/csv' if f_t == 'csv' else 'application/x-ndjson'
+        return Response(stream_with_context(generate()), mimetype=mimetype,
+                        headers={'Content-Disposition': f'attachment; filename=events.{f_t}'})
+
+
+@api.route('/events/batch')
+class EventBatch(Resource):
+    max_ids = 200
+
+    @api.doc('get_events_batch')
+    @api.response(200, 'Success')
+    @api.response(400, 'Bad Request')
+    @api.param('ids', 'Comma separated event ids (at most 200)')
+    @cached_get()
+    def get(self):
+        """Get many events by ID, each as GET /events/<id> returns it"""
+        try:
+            ids = list(dict.fromkeys(int(i) for i in request.args.get("ids", "").split(",") if i.strip()))
+        except ValueError:
+            return {"message": "Invalid ids. Please use comma separated event ids."}, 400
+        if not ids or len(ids) > self.max_ids:
+            return {"message": f"Please ask for between 1 and {self.max_ids} ids."}, 400
+
+        rows = database.execute(f"SELECT {EVENT_COLUMNS} FROM events WHERE id IN ({', '.join('?' * len(ids))})",
+                                ids).fetchall()
+        found = {row[0]: row for row in rows}
+        rows = [found[i] for i in ids if i in found]
         return {
-                   "page": n_p,
-                   "page-size": size,
-                   "events": show,
-                   "_links": links,
-               }, 200
+            "events": expand_events(rows),
+            "missing": [i for i in ids if i not in found]
+        }, 200
 
 
 @api.route('/events/<int:event_id>')
@@ -208,110 +1917,13 @@ class Event(Resource):
     @api.response(400, 'Bad Request')
     @api.response(404, 'Resource Not Found')
     @api.response(500, 'Internal Server Error')
+    @cached_get(event_last_update)
     def get(self, event_id):
         """Get an event by ID"""
-        c.execute("SELECT * FROM events WHERE id = ?", (event_id,))
-        row = c.fetchone()
+        row = database.execute(f"SELECT {EVENT_COLUMNS} FROM events WHERE id = ?", (event_id,)).fetchone()
         if row is None:
             return {'message': 'Event not found'}, 404
-        aus_holidays = requests.get("https://date.nager.at/api/v2/publicholidays/2023/AU").json()
-        holi_d = None
-        event_date = datetime.datetime.strptime(row[2], '%d-%m-%Y')
-        for e in aus_holidays:
-            h_d = datetime.datetime.strptime(e['date'], '%Y-%m-%d')
-            if h_d == event_date:
-                holi_d = e['name']
-                break
-
-        previous_event = None
-        next_event = None
-        c.execute("SELECT * FROM events ")
-        events = c.fetchall()
-        for e in events:
-            new_e = datetime.datetime.strptime(e[2], '%d-%m-%Y')
-            if next_event:
-                next_event = list(next_event)
-                if isinstance(next_event[2], str):
-                    next_event[2] = datetime.datetime.strptime(next_event[2], '%d-%m-%Y')
-            if previous_event:
-                previous_event = list(previous_event)
-                if isinstance(previous_event[2], str):
-                    previous_event[2] = datetime.datetime.strptime(previous_event[2], '%d-%m-%Y')
-            if (not previous_event or new_e > previous_event[2] or
-                (new_e == previous_event[2] and e[3] > previous_event[3])) and new_e < event_date or (
-                    new_e == event_date and e[3] < row[3]):
-                previous_event = e
-            if (not next_event or new_e < next_event[2] or
-                (new_e == next_event[2] and e[3] < next_event[3])) and new_e > event_date or (
-                    new_e == event_date and e[3] > row[3]):
-                next_event = e
-
-        weather_forecast = {
-            "wind-speed": None,
-            "weather": None,
-            "humidity": None,
-            "temperature": None
-        }
-        current_date = datetime.date.today()
-        difference = (event_date.date() - current_date).days
-        if difference >= 1 and difference <= 7:
-            try:
-                filtered_df = sub[
-                    (sub['Official Name Suburb'].str.contains(row[6])) & (sub['state'].str.contains(row[7]))]
-                lat, lng = filtered_df['Geo Point'].iloc[0].split(', ')
-                response = requests.get(
-                    f"https://www.7timer.info/bin/civil.php?lat={lat}&lng={lng}&ac=1&unit=metric&output=json&product=two")
-                weather = response.json()['dataseries'][0]
-                weather_forecast = {
-                    "wind-speed": f"{weather['wind10m']}{' The speed unit is KM.'}",
-                    "weather": f"{weather['weather']}",
-                    "humidity": f"{weather['rh2m']}",
-                    "temperature": f"{weather['temp2m']}C"
-                }
-            except IndexError:
-                pass
-        links = {"self": {"href": f"/events/{row[0]}"}}
-        if previous_event:
-            links["previous"] = {"href": f"/events/{previous_event[0]}"}
-        if next_event:
-            links["next"] = {"href": f"/events/{next_event[0]}"}
-
-        res = {
-            'id': row[0],
-            "last-update": row[10],
-            'name': row[1],
-            'date': row[2],
-            'from': row[3],
-            'to': row[4],
-            'location': {
-                'street': row[5],
-                'suburb': row[6],
-                'state': row[7],
-                'post-code': row[8]
-            },
-            'description': row[9],
-            "_metadata": {
-                "wind-speed": None,
-                "weather": None,
-                "humidity": None,
-                "temperature": None,
-                "holiday": holi_d,
-                "weekend": event_date.weekday() >= 5
-            },
-            "_links": links
-        }
-
-        if difference >= 1 and difference <= 7:
-            res["_metadata"].update({
-                "wind-speed": weather_forecast['wind-speed'],
-                "weather": weather_forecast['weather'],
-                "humidity": weather_forecast['humidity'],
-                "temperature": weather_forecast['temperature'],
-            })
-        weather_vali = any(res["_metadata"].get(k) is not None for k in ["wind-speed", "weather", "humidity", "temperature"])
-        if not weather_vali:
-            res["_metadata"] = {"holiday": holi_d, "weekend": event_date.weekday() >= 5}
-        return res, 200
+        return expand_events([row])[0], 200
 
     @api.doc('delete_event')
     @api.response(201, 'Created')
@@ -321,13 +1933,11 @@ class Event(Resource):
     @api.response(500, 'Internal Server Error')
     def delete(self, event_id):
         """Delete an event by ID"""
-        c.execute("SELECT * FROM events WHERE id=%s" % event_id)
-        row = c.fetchone()
-        if row is None:
+        with database.transaction() as db:
+            deleted = db.execute("DELETE FROM events WHERE id = ?", (event_id,)).rowcount
+        if not deleted:
             return {'message': 'Event not exist'}, 404
         else:
-            c.execute("DELETE FROM events WHERE id=?", (event_id,))
-            conn.commit()
             return {'message': f'The event with id {event_id} was removed from the database!', 'id': event_id}, 200
 
     @api.doc('update an event by id')
@@ -341,18 +1951,17 @@ class Event(Resource):
     def patch(self, event_id):
         """Update an event by ID"""
         data = request.get_json()
-        if not data:
+        if not data or not isinstance(data, dict):
             return {'message': 'Invalid Input'}, 400
 
-        c.execute("SELECT * FROM events WHERE id=%s" % event_id)
-        row = c.fetchone()
+        row = database.execute(f"SELECT {EVENT_COLUMNS} FROM events WHERE id = ?", (event_id,)).fetchone()
         if row is None:
             return {'message': 'Event not found'}, 404
         else:
             name = row[1]
-            date = row[2]
-            start_time = row[3]
-            end_time = row[4]
+            date_iso = row[2]
+            start_min = row[3]
+            end_min = row[4]
             street = row[5]
             suburb = row[6]
             state = row[7]
@@ -361,11 +1970,17 @@ class Event(Resource):
             if 'name' in data:
                 name = data['name']
             if 'date' in data:
-                date = data['date']
+                date_iso = parse_date(data['date'])
+                if date_iso is None:
+                    return {'message': 'Invalid date input. Please follow the format: DD-MM-YYYY.'}, 400
             if 'from' in data:
-                start_time = data['from']
+                start_min = parse_time(data['from'])
             if 'to' in data:
-                end_time = data['to']
+                end_min = parse_time(data['to'])
+            if start_min is None or end_min is None:
+                return {'message': 'Invalid time input. Please follow the format: HH:MM or HH:MM:SS.'}, 400
+            if start_min >= end_min:
+                return {'message': 'Invalid time range. An event must end after it starts.'}, 400
             if 'street' in data:
                 street = data['street']
             if 'suburb' in data:
@@ -376,12 +1991,21 @@ class Event(Resource):
                 post_code = data['post_code']
             if 'description' in data:
                 description = data['description']
+            try:
+                check_fields({k: data[k] for k in ('name', 'street', 'suburb', 'state', 'post_code', 'description')
+                              if k in data})
+            except ValueError as e:
+                return {'message': str(e)}, 400
 
-            query = "UPDATE events SET name='%s', date='%s', start_time='%s', end_time='%s', street='%s', suburb='%s', state='%s', post_code='%s', description='%s', last_update=CURRENT_TIMESTAMP WHERE id=%s" % (
-                name, date, start_time, end_time, street, suburb, state, post_code, description, event_id)
-            c.execute(query)
-
-            conn.commit()
+            with database.transaction() as db:
+                if find_overlap(date_iso, start_min, end_min, exclude=event_id):
+                    return {'message': 'The event overlaps with another event'}, 400
+                series_id = find_series_overlap(date_iso, start_min, end_min)
+                if series_id:
+                    return {'message': f'The event overlaps with recurring event {series_id}'}, 400
+                query = "UPDATE events SET name=?, date_iso=?, start_min=?, end_min=?, street=?, suburb=?, state=?, post_code=?, description=?, last_update=CURRENT_TIMESTAMP WHERE id=?"
+                db.execute(query, (name, date_iso, start_min, end_min, street, suburb, state, post_code, description,
+                                   event_id))
 
             res = {
                 'id': event_id,
@@ -393,6 +2017,302 @@ class Event(Resource):
             return res, 200
 
 
+series_model = api.inherit('Series', event, {
+    'repeat': fields.Nested(api.model('Repeat', {
+        'freq': fields.String(required=True, description='daily, weekly (same weekday) or monthly (same day)'),
+        'interval': fields.Integer(description='Every n-th day, week or month (default: 1)'),
+        'count': fields.Integer(description='Number of occurrences, excluded dates included'),
+        'until': fields.String(description='Last possible date, format: dd-mm-yyyy'),
+        'except': fields.List(fields.String, description='Dates to skip, format: dd-mm-yyyy')
+    }), required=True)
+})
+
+
+def series_detail(s):
+    return {
+        'id': s.id,
+        'last-update': s.row[10],
+        'name': s.row[1],
+        'date': format_date(s.row[2]),
+        'from': format_time(s.start_min),
+        'to': format_time(s.end_min),
+        'location': {
+            'street': s.row[5],
+            'suburb': s.row[6],
+            'state': s.row[7],
+            'post-code': s.row[8]
+        },
+        'description': s.row[9],
+        'repeat': {
+            'freq': s.freq,
+            'interval': s.interval,
+            'count': s.count,
+            'until': format_date(s.until and s.until.isoformat()),
+            'except': [format_date(d) for d in sorted(s.exdates)]
+        },
+        '_links': {'self': {'href': f'/series/{s.id}'}}
+    }
+
+
+@api.route('/series')
+class SeriesList(Resource):
+    @api.doc('create_series')
+    @api.response(201, 'Created')
+    @api.response(400, 'Bad Request')
+    @api.expect(series_model)
+    def post(self):
+        """Create a recurring event"""
+        info = request.get_json()
+        try:
+            row = parse_event(info)
+            repeat = parse_repeat(info.get('repeat'), row[1])
+        except ValueError as e:
+            return {'message': str(e)}, 400
+        last_update = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        values = row + (last_update,) + repeat
+        with database.transaction() as db:
+            hit = series_conflict(Series((None,) + values))
+            if hit is not None:
+                kind = 'event' if hit[0] == 'event' else 'recurring event'
+                return {'message': f'The series overlaps with {kind} {hit[1]}'}, 400
+            series_id = db.execute(INSERT_SERIES, values).lastrowid
+        return {
+            'id': series_id,
+            'last-update': last_update,
+            '_links': {'self': {'href': f'/series/{series_id}'}}
+        }, 201
+
+    @api.doc('list_series')
+    @api.response(200, 'Success')
+    def get(self):
+        """Get every recurring event"""
+        rows = database.execute(f"SELECT {SERIES_COLUMNS} FROM series ORDER BY id").fetchall()
+        return {'series': [series_detail(Series(row)) for row in rows]}, 200
+
+
+@api.route('/series/<int:series_id>')
+@api.param('series_id', 'The ID of the recurring event')
+class SeriesItem(Resource):
+    @api.doc('get_series')
+    @api.response(200, 'Success')
+    @api.response(400, 'Bad Request')
+    @api.response(404, 'Resource Not Found')
+    @api.param('from', 'List occurrences on or after this date, format: dd-mm-yyyy (default: today)')
+    @api.param('to', 'List occurrences on or before this date, format: dd-mm-yyyy (default: the series horizon)')
+    def get(self, series_id):
+        """Get a recurring event and its occurrences in a date range"""
+        row = database.execute(f"SELECT {SERIES_COLUMNS} FROM series WHERE id = ?", (series_id,)).fetchone()
+        if row is None:
+            return {'message': 'Series not found'}, 404
+        s = Series(row)
+        first = parse_date(request.args.get('from', format_date(datetime.date.today().isoformat())))
+        last = parse_date(request.args.get('to', '31-12-9999'))
+        if first is None or last is None:
+            return {'message': 'Invalid date input. Please follow the format: DD-MM-YYYY.'}, 400
+        res = series_detail(s)
+        res['occurrences'] = [format_date(day.isoformat()) for day in s.occurrences(to_date(first), to_date(last))]
+        return res, 200
+
+    @api.doc('delete_series')
+    @api.response(200, 'Success')
+    @api.response(404, 'Resource Not Found')
+    def delete(self, series_id):
+        """Delete a recurring event and all its occurrences"""
+        with database.transaction() as db:
+            deleted = db.execute("DELETE FROM series WHERE id = ?", (series_id,)).rowcount
+        if not deleted:
+            return {'message': 'Series not exist'}, 404
+        return {'message': f'The series with id {series_id} was removed from the database!', 'id': series_id}, 200
+
+    @api.doc('update_series_exceptions')
+    @api.expect(api.model('SeriesExceptions', {
+        'except': fields.List(fields.String, description='Dates to skip, format: dd-mm-yyyy')}))
+    @api.response(200, 'Success')
+    @api.response(400, 'Bad Request')
+    @api.response(404, 'Resource Not Found')
+    def patch(self, series_id):
+        """Replace the dates a recurring event skips"""
+        data = request.get_json()
+        exdates = data.get('except') if isinstance(data, dict) else None
+        if not isinstance(exdates, list) or any(parse_date(d) is None for d in exdates):
+            return {'message': 'Invalid Input. except must be a list of DD-MM-YYYY dates.'}, 400
+        exdates = json.dumps(sorted({parse_date(d) for d in exdates}))
+        with database.transaction() as db:
+            row = db.execute(f"SELECT {SERIES_COLUMNS} FROM series WHERE id = ?", (series_id,)).fetchone()
+            if row is None:
+                return {'message': 'Series not found'}, 404
+            # fewer exceptions means more occurrences, which must not collide with anything
+            hit = series_conflict(Series(row[:15] + (exdates,)))
+            if hit is not None:
+                kind = 'event' if hit[0] == 'event' else 'recurring event'
+                return {'message': f'The series overlaps with {kind} {hit[1]}'}, 400
+            db.execute("UPDATE series SET exdates = ?, last_update = CURRENT_TIMESTAMP WHERE id = ?",
+                       (exdates, series_id))
+        return {'id': series_id, '_links': {'self': {'href': f'/series/{series_id}'}}}, 200
+
+
+CHART_LABELS = {
+    'yellow': 'Current Week & Month',
+    'blue': 'Current Week',
+    'green': 'Current Month',
+    'grey': 'others'
+}
+
+
+def load_matplotlib():
+    import matplotlib.figure
+    import matplotlib.patches
+
+
+def render_chart(per_day, sw, ew, sm, em, fmt='png', width=12, height=6, dpi=100):
+    """Bar chart of events per day; runs in a worker process and uses no pyplot global state"""
+    from matplotlib.figure import Figure
+    from matplotlib.patches import Patch
+
+    x = [to_date(d) for d, _ in per_day]
+    y = [n for _, n in per_day]
+    color_choice = []
+    for date in x:
+        if sw <= date <= ew and sm <= date <= em:
+            color = 'yellow'  # current week and month
+        elif sw <= date <= ew:
+            color = 'blue'  # current week
+        elif sm <= date <= em:
+            color = 'green'  # current month
+        else:
+            color = 'grey'  # default color
+        color_choice.append(color)
+
+    fig = Figure(figsize=(width, height), dpi=dpi)
+    ax = fig.subplots()
+    ax.bar([format_date(d) for d, _ in per_day], y, color=color_choice)
+    ax.set_xlabel('Date')
+    ax.set_ylabel('Number of events per day')
+    ax.set_title('Event Statistics')
+    ax.tick_params(axis='x', rotation=45, labelsize=8)
+    layout = [Patch(facecolor=color, label=label) for color, label in CHART_LABELS.items() if color in color_choice]
+    ax.legend(handles=layout, loc='best')
+    fig.tight_layout()
+    img_buf = BytesIO()
+    fig.savefig(img_buf, format=fmt)
+    return img_buf.getvalue()
+
+
+def _exit_with_parent():
+    """Chart worker initializer: the pool only shuts its workers down on a clean exit, so a worker also ends as soon
+    as the process that spawned it is gone (SIGTERM, SIGKILL, crash)"""
+    parent = multiprocessing.parent_process()
+    if parent is not None:
+        threading.Thread(target=lambda: (parent.join(), os._exit(0)), name='parent-watch', daemon=True).start()
+
+
+def serve_charts(address, ready):
+    """The chart renderer `serve` shares between its workers: renders whatever they send to the unix socket
+    `address`, one chart at a time, so matplotlib is loaded once for the whole deployment"""
+    _exit_with_parent()
+    with Listener(address, 'AF_UNIX', authkey=multiprocessing.current_process().authkey) as listener:
+        ready.set()
+        load_matplotlib()
+        while True:
+            try:
+                conn = listener.accept()
+            except (OSError, multiprocessing.AuthenticationError):
+                continue
+            with conn:
+                try:
+                    args = conn.recv()
+                    try:
+                        chart = render_chart(*args)
+                    except Exception as e:
+                        chart = e
+                    conn.send(chart)
+                except (OSError, EOFError):
+                    pass
+
+
+class ChartRenderer:
+    """Renders charts in a process pool (or, given `address`, in the renderer serve_charts runs there) and keeps the
+    most recent results, keyed by what they were drawn from"""
+
+    def __init__(self, workers=int(os.environ.get('CHART_WORKERS', 2)), max_charts=32, timeout=60, address=None):
+        self.workers = workers
+        self.max_charts = max_charts
+        self.timeout = timeout
+        self.address = address
+        self._pool = None
+        self._charts = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def etag(key):
+        return hashlib.sha1(repr(key).encode()).hexdigest()
+
+    def render(self, key, *args):
+        with self._lock:
+            chart = self._charts.get(key)
+            metrics.cache('charts', chart is not None)
+            if chart is not None:
+                self._charts.move_to_end(key)
+                return chart
+        if shared_cache is not None:
+            chart = shared_cache.get(f'chart:{self.etag(key)}', 'charts_shared')
+        if chart is None:
+            with metrics.timer('calendar_stage_seconds', stage='chart'):
+                chart = self._render(args)
+            if shared_cache is not None:
+                # the key holds the data version and the current week, so a day is only a bound on the file size
+                shared_cache.set(f'chart:{self.etag(key)}', chart, 24 * 3600)
+        with self._lock:
+            self._charts[key] = chart
+            while len(self._charts) > self.max_charts:
+                self._charts.popitem(last=False)
+        return chart
+
+    def _render(self, args):
+        if self.address is not None:
+            try:
+                with Client(self.address, 'AF_UNIX', authkey=multiprocessing.current_process().authkey) as conn:
+                    conn.send(args)
+                    if conn.poll(self.timeout):
+                        chart = conn.recv()
+                        if isinstance(chart, Exception):
+                            raise chart
+                        return chart
+            except (OSError, EOFError, multiprocessing.AuthenticationError):
+                pass
+            # the renderer is down or being restarted: draw this one here rather than fail the request
+            return render_chart(*args)
+        try:
+            return self._executor().submit(render_chart, *args).result(self.timeout)
+        except (BrokenProcessPool, OSError):
+            with self._lock:
+                self._pool = None
+            return render_chart(*args)
+
+    def warm(self):
+        """Start the worker processes and import matplotlib in each, ahead of the first chart"""
+        if self.address is not None:
+            return  # the shared renderer loads matplotlib itself
+        try:
+            futures = [self._executor().submit(load_matplotlib) for _ in range(self.workers)]
+            for future in futures:
+                future.result(self.timeout)
+        except (BrokenProcessPool, OSError):
+            with self._lock:
+                self._pool = None
+            load_matplotlib()
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                                 initializer=_exit_with_parent)
+            return self._pool
+
+
+charts = ChartRenderer()
+
+
 @api.route('/events/statistics')
 class Stats(Resource):
     @api.doc('Get_statistics_of_events')
@@ -401,92 +2321,338 @@ class Stats(Resource):
     @api.response(400, 'Bad Request')
     @api.response(404, 'Resource Not Found')
     @api.response(500, 'Internal Server Error')
-    @api.param('format', 'Response format (json or image)')
+    @api.param('format', 'Response format (json, image for PNG, or svg)')
+    @api.param('width', 'Chart width in inches (default: 12)')
+    @api.param('height', 'Chart height in inches (default: 6)')
+    @api.param('dpi', 'Chart resolution (default: 100)')
+    @api.param('from', 'First day to report per-day counts for, format: dd-mm-yyyy (default: no limit; '
+                       'recurring events are counted up to the series horizon)')
+    @api.param('to', 'Last day to report per-day counts for, format: dd-mm-yyyy (default: no limit)')
     def get(self):
         """Get statistics of existing events"""
         f_t = request.args.get("format", "json")
-        c.execute("SELECT date FROM events")
-        results = c.fetchall()
-        total_events = len(results)
-        stats = {}
-        for row in results:
-            date = row[0]
-            stats[date] = stats[date] + 1 if date in stats else 1
+        first = parse_date(request.args.get("from", "01-01-0001"))
+        last = parse_date(request.args.get("to", "31-12-9999"))
+        if first is None or last is None:
+            return {'message': 'Invalid date input. Please follow the format: DD-MM-YYYY.'}, 400
+
+        total_events = database.execute("SELECT value FROM counters WHERE name = 'events'").fetchone()[0]
+        per_day = database.execute("SELECT date_iso, count FROM daily_counts WHERE date_iso BETWEEN ? AND ? "
+                                   "ORDER BY date_iso", (first, last)).fetchall()
+        recurring = series_between('0001-01-01', '9999-12-31')
+        if recurring:
+            total_events += sum(r.count_between(r.start, r.end) for r in recurring)
+            counts = dict(per_day)
+            for r in recurring:
+                for day in r.occurrences(to_date(first), to_date(last)):
+                    counts[day.isoformat()] = counts.get(day.isoformat(), 0) + 1
+            per_day = sorted(counts.items())
 
         today = datetime.date.today()
         sw = today - datetime.timedelta(days=today.weekday())
         ew = sw + datetime.timedelta(days=6)
         sm = today.replace(day=1)
-        em = sm.replace(month=sm.month % 12 + 1) - datetime.timedelta(days=1)
-        cwe = sum(stats.get(date, 0) for date in stats if sw <= datetime.datetime.strptime(date, '%d-%m-%Y').date() <= ew and today.year == datetime.datetime.strptime(date, '%d-%m-%Y').date().year)
-        cme = sum(stats.get(date, 0) for date in stats if sm <= datetime.datetime.strptime(date, '%d-%m-%Y').date() <= em and today.year == datetime.datetime.strptime(date, '%d-%m-%Y').date().year)
-
-        if f_t == "image":
-            x = list(stats.keys())
-            x = [datetime.datetime.strptime(date, '%d-%m-%Y').date() for date in x]
-            y = list(stats.values())
-            color_choice = []
-            u_c = set()
-            for date in stats:
-                if sw <= datetime.datetime.strptime(date, '%d-%m-%Y').date() <= ew \
-                        and sm <= datetime.datetime.strptime(date, '%d-%m-%Y').date() <= em:
-                    color = 'yellow'  # current week and month
-                elif sw <= datetime.datetime.strptime(date, '%d-%m-%Y').date() <= ew:
-                    color = 'blue'  # current week
-                elif sm <= datetime.datetime.strptime(date, '%d-%m-%Y').date() <= em:
-                    color = 'green'  # current month
-                else:
-                    color = 'grey'  # default color
-                color_choice.append(color)
-                if color not in u_c:
-                    u_c.add(color)
-
-            x, y, colors = zip(*sorted(zip(x, y, color_choice)))
-            fig, ax = plt.subplots(figsize=(12, 6))
-            ax.bar([date.strftime('%d-%m-%Y') for date in x], y, color=colors)
-            ax.set_xlabel('Date')
-            ax.set_ylabel('Number of events per day')
-            ax.set_title('Event Statistics')
-            ax.tick_params(axis='x', rotation=45, labelsize=8)
-
-            layout = []
-            for color in u_c:
-                if color == 'green':
-                    label = 'Current Month'
-                elif color == 'yellow':
-                    label = 'Current Week & Month'
-                elif color == 'grey':
-                    label = 'others'
-                elif color == 'blue':
-                    label = 'Current Week'
-                layout.append(Patch(facecolor=color, label=label))
-
-            ax.legend(handles=layout, loc='best')
-            fig.tight_layout()
-            img_buf = BytesIO()
-            fig.savefig(img_buf, format='png')
-            img_buf.seek(0)
-            return send_file(img_buf, mimetype='image/png')
+        em = (sm + datetime.timedelta(days=31)).replace(day=1) - datetime.timedelta(days=1)
+        cwe = count_between(sw, ew)
+        cme = count_between(sm, em)
 
-        return {
+        if f_t in ("image", "svg"):
+            try:
+                width = float(request.args.get("width", 12))
+                height = float(request.args.get("height", 6))
+                dpi = int(request.args.get("dpi", 100))
+                if not (0 < width <= 50 and 0 < height <= 50 and 0 < dpi <= 600):
+                    raise ValueError
+            except ValueError:
+                return {"message": "Invalid chart size. width and height are inches (up to 50), dpi up to 600."}, 400
+            fmt = "svg" if f_t == "svg" else "png"
+            # today fixes the week and month shown and how far open-ended series run, so it keys the chart too
+            key = (data_version(), first, last, today, fmt, width, height, dpi)
+            etag = charts.etag(key)
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+            else:
+                chart = charts.render(key, per_day, sw, ew, sm, em, fmt, width, height, dpi)
+                response = Response(chart, mimetype="image/svg+xml" if fmt == "svg" else "image/png")
+            response.set_etag(etag)
+            response.headers["Cache-Control"] = "no-cache"
+            return response
+
+        res = {
             "total": total_events,
             "total-current-week": cwe,
             "total-current-month": cme,
-            "per-days": {k: v for k, v in sorted(stats.items(), key=lambda x: datetime.datetime.strptime(x[0], '%d-%m-%Y'), reverse=False)}
-        }, 200
+            "per-days": {format_date(d): n for d, n in per_day}
+        }
+        if "from" in request.args or "to" in request.args:
+            res["total-range"] = sum(n for _, n in per_day)
+        return res, 200
 
 
-if __name__ == '__main__':
-    sub = pd.read_csv('georef-australia-state-suburb.csv', delimiter=';')
-    state_map = {
-        'New South Wales': 'NSW',
-        'Victoria': 'VIC',
-        'Queensland': 'QLD',
-        'Western Australia': 'WA',
-        'South Australia': 'SA',
-        'Tasmania': 'TAS',
-        'Northern Territory': 'NT',
-        'Australian Capital Territory': 'ACT'
-    }
-    sub['state'] = sub['Official Name State'].replace(state_map)
+PROFILING = os.environ.get('CALENDAR_PROFILING') == '1'
+PROFILE_DIR = os.environ.get('CALENDAR_PROFILE_DIR', 'profiles')
+profile_ids = itertools.count(1)
+
+
+class MetricsPublisher:
+    """With a shared cache, every process copies its metrics there each `interval` seconds, so that /metrics, whichever
+    worker answers it, reports the sum over all of them"""
+
+    def __init__(self, interval=5):
+        self.interval = interval
+        self.pid = None
+        self.worker = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Idempotent per process: a forked worker starts its own"""
+        if self.pid == os.getpid():
+            return
+        with self._lock:
+            if self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.worker = f'{self.pid}@{time.time():.6f}'  # pids get reused, a worker's counts must not be
+                threading.Thread(target=self._run, name='metrics', daemon=True).start()
+
+    def publish(self):
+        shared_cache.put_metrics(self.worker, json.dumps(metrics.snapshot()))
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.publish()
+            except sqlite3.Error:
+                pass
+
+
+metrics_publisher = MetricsPublisher()
+
+
+def start_request():
+    g.started = time.perf_counter()
+    if shared_cache is not None:
+        metrics_publisher.start()
+    if PROFILING and (request.args.get('profile') == '1' or request.headers.get('X-Profile') == '1'):
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+
+def finish_request(response):
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{request.endpoint}-{os.getpid()}-"
+                                         f"{next(profile_ids)}.prof")
+        profiler.dump_stats(path)
+        response.headers['X-Profile'] = path
+    if 'started' in g:
+        rule = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.observe('calendar_request_seconds', time.perf_counter() - g.started,
+                        route=rule, method=request.method, status=response.status_code)
+    return response
+
+
+def prometheus_metrics():
+    if shared_cache is None:
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+    metrics_publisher.start()
+    metrics_publisher.publish()
+    snapshots = [json.loads(snapshot) for snapshot in shared_cache.all_metrics()]
+    return Response(metrics.render(snapshots), mimetype='text/plain; version=0.0.4')
+
+
+class WarmUp:
+    """Fills the caches once, in a background thread, so that the first requests do not pay for it"""
+
+    def __init__(self, steps):
+        self.steps = steps
+        self.status = {name: {'state': 'pending'} for name in steps}
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='warm-up', daemon=True)
+                self._thread.start()
+
+    def ready(self):
+        return all(s['state'] != 'pending' for s in self.status.values())
+
+    def _run(self):
+        for name, fn in self.steps.items():
+            started = time.perf_counter()
+            try:
+                # a step returning False ran but had nothing to load (e.g. no georef CSV)
+                state = 'unavailable' if fn() is False else 'ready'
+            except Exception as e:
+                state = f'failed: {e}'
+            self.status[name] = {'state': state, 'seconds': round(time.perf_counter() - started, 3)}
+
+
+def _warm_holidays():
+    today = datetime.date.today()
+    holidays.warm([today.year, today.year + 1])
+
+
+warmup = WarmUp({'geo': geo.load, 'holidays': _warm_holidays, 'charts': charts.warm})
+
+
+def readiness():
+    """200 once the warm-up has run (whatever each step's outcome), 503 while it is still going; the first probe
+    starts it if create_app() did not"""
+    warmup.start()
+    ready = warmup.ready()
+    return {'ready': ready, 'caches': warmup.status}, 200 if ready else 503
+
+
+def create_app(warm_up=True):
+    """The WSGI app, e.g. `gunicorn 'source_code:create_app()'`; warm_up starts filling the caches right away"""
+    app = Flask(__name__)
+    api.init_app(app)
+    app.teardown_appcontext(release_connection)
+    app.before_request(start_request)
+    app.after_request(finish_request)
+    app.add_url_rule('/metrics', view_func=prometheus_metrics)
+    app.add_url_rule('/ready', view_func=readiness)
+    if warm_up:
+        warmup.start()
+    return app
+
+
+app = create_app(warm_up=False)
+
+
+def migrate_file(path):
+    """Upgrade the database at `path` in place; returns the schema versions before and after"""
+    db = sqlite3.connect(path, isolation_level=None)
+    try:
+        db.execute("PRAGMA journal_mode = WAL")
+        before = db.execute("PRAGMA user_version").fetchone()[0]
+        migrate(db)
+        return before, db.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        db.close()
+
+
+def serve(host, port, workers, cache):
+    """Pre-fork server: bind once, prepare what workers can share, then run `workers` processes on that socket.
+
+    The parent migrates the database and maps the geo index before forking, so every worker uses the same pages.
+    Holidays, forecasts, charts and responses go through the sqlite file `cache`, so one worker's fetch or render
+    serves them all, and one chart renderer process draws for every worker. A worker (or the renderer) that dies is
+    replaced; SIGTERM or SIGINT stops them all.
+    """
+    global shared_cache, response_cache
+    # counters start from zero with every start, as they would in one process; a throwaway instance, so that no
+    # pooled connection is open across the fork
+    SharedCache(cache).clear_metrics()
+    shared_cache = SharedCache(cache)
+    if 'RESPONSE_CACHE' not in os.environ:
+        response_cache = SqliteResponseCache(cache, int(os.environ.get('RESPONSE_CACHE_BYTES', 256 * 1024 * 1024)))
+    migrate_file(database.path)
+    geo.load()
+    listener = socket.create_server((host, port), backlog=1024)
+    children = set()
+    stopping = False
+    renderer = None
+    sockets = tempfile.mkdtemp(prefix='calendar-')
+
+    def start_renderer():
+        try:
+            os.unlink(charts.address)  # left behind by a renderer that was killed
+        except FileNotFoundError:
+            pass
+        ctx = multiprocessing.get_context('spawn')
+        ready = ctx.Event()
+        process = ctx.Process(target=serve_charts, args=(charts.address, ready), name='charts', daemon=True)
+        process.start()
+        deadline = time.monotonic() + 30
+        while not ready.wait(0.1) and time.monotonic() < deadline:
+            if not process.is_alive():
+                print('The chart renderer failed to start; workers draw their own charts', flush=True)
+                return None
+        return process
+
+    if 'CHART_WORKERS' not in os.environ:  # otherwise every worker gets a pool of its own
+        charts.address = os.path.join(sockets, 'charts.sock')
+        renderer = start_renderer()
+
+    def spawn():
+        pid = os.fork()
+        if pid:
+            children.add(pid)
+            return
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        try:
+            make_server(host, port, create_app(), threaded=True, fd=listener.fileno()).serve_forever()
+        finally:
+            os._exit(1)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children | ({renderer.pid} if renderer is not None else set()):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(workers):
+        spawn()
+    print(f'Serving on http://{host}:{port} with {workers} workers', flush=True)
+    while children:
+        try:
+            pid, _ = os.wait()
+        except ChildProcessError:
+            break
+        if renderer is not None and pid == renderer.pid:
+            if not stopping:
+                time.sleep(0.5)
+                renderer = start_renderer()  # workers draw their own charts until it is back
+        elif pid in children:
+            children.discard(pid)
+            if not stopping:
+                time.sleep(0.5)  # do not spin if workers die on start-up
+                spawn()
+    listener.close()
+    shutil.rmtree(sockets, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Calendar service for Australians')
+    commands = parser.add_subparsers(dest='command')
+    commands.add_parser('run', help='serve with the Flask development server (default)')
+    p = commands.add_parser('migrate', help='upgrade a database to the current schema ahead of a deploy and exit')
+    p.add_argument('--db', default=DB_PATH)
+    p = commands.add_parser('serve', help='production mode: worker processes sharing one socket and one set of caches')
+    p.add_argument('--host', default='127.0.0.1')
+    p.add_argument('--port', type=int, default=5000)
+    p.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    p.add_argument('--cache', default=os.environ.get('SHARED_CACHE', 'calendar-cache.db'),
+                   help='sqlite file for the caches the workers share')
+    args = parser.parse_args(argv)
+
+    if args.command == 'migrate':
+        started = time.perf_counter()
+        before, after = migrate_file(args.db)
+        print(f'{args.db}: schema version {before} -> {after} in {time.perf_counter() - started:.1f}s')
+        return
+    if args.command == 'serve':
+        serve(args.host, args.port, args.workers, args.cache)
+        return
+    # with the reloader on, only the child process (WERKZEUG_RUN_MAIN) serves requests
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        warmup.start()
     app.run(debug=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import source_code  # noqa: E402
+
+LEGACY_INSERT = ("INSERT INTO events (name, date, start_time, end_time, street, suburb, state, post_code, description, "
+                 "last_update) VALUES (?, ?, ?, ?, '1 George St', 'Sydney', 'NSW', '2000', ?, '2023-04-01 10:00:00')")
+
+
+def baseline(path, rows, delete=()):
+    """A database as the original service left it: the text date/time schema, no user_version"""
+    db = sqlite3.connect(path, isolation_level=None)
+    db.execute(source_code.SCHEMA)
+    for row in rows:
+        db.execute(LEGACY_INSERT, row)
+    for event_id in delete:
+        db.execute("DELETE FROM events WHERE id = ?", (event_id,))
+    db.close()
+
+
+@pytest.fixture
+def legacy(tmp_path):
+    path = str(tmp_path / 'mydb.db')
+    baseline(path, [
+        ('standup', '05-03-2030', '09:00', '10:30', None),
+        ('review', '05-03-2030', '11:00', '12:00', 'sprint review'),
+        ('legacy', '2030-03-06', '13:00', '14:00', None),  # written before dates were validated
+        ('seconds', '07-03-2030', '9:05:00', '10:00', None),
+        ('deleted', '08-03-2030', '09:00', '10:00', None)
+    ], delete=[5])
+    return path
+
+
+def test_compact_events_keeps_rows_and_aggregates(legacy):
+    assert source_code.migrate_file(legacy) == (0, len(source_code.MIGRATIONS))
+
+    db = sqlite3.connect(legacy)
+    rows = db.execute("SELECT id, name, date_iso, start_min, end_min, description FROM events ORDER BY id").fetchall()
+    assert rows == [
+        (1, 'standup', '2030-03-05', 540, 630, None),
+        (2, 'review', '2030-03-05', 660, 720, 'sprint review'),
+        (3, 'legacy', None, 780, 840, None),
+        (4, 'seconds', '2030-03-07', 545, 600, None)
+    ]
+    columns = [c[1] for c in db.execute("PRAGMA table_info(events)")]
+    assert columns == source_code.EVENT_COLUMNS.split(', ')
+    assert db.execute("SELECT value FROM counters WHERE name = 'events'").fetchone() == (4,)
+    assert db.execute("SELECT date_iso, count FROM daily_counts ORDER BY date_iso").fetchall() == [
+        ('2030-03-05', 2), ('2030-03-07', 1)]
+    assert db.execute("SELECT seq FROM sqlite_sequence WHERE name = 'events'").fetchall() == [(5,)]
+    indexes = {row[0] for row in db.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {'events_date_start_id', 'events_date_slot'} <= indexes
+
+    # the triggers were recreated on the new table, and deleted ids stay retired
+    version = db.execute("SELECT value FROM counters WHERE name = 'data_version'").fetchone()[0]
+    new_id = db.execute(source_code.INSERT_EVENT, ('new', '2030-03-07', 600, 660, 'x', 'Sydney', 'NSW', '2000', None,
+                                                   '2030-01-01 00:00:00')).lastrowid
+    db.commit()
+    assert new_id == 6
+    assert db.execute("SELECT value FROM counters WHERE name = 'events'").fetchone() == (5,)
+    assert db.execute("SELECT count FROM daily_counts WHERE date_iso = '2030-03-07'").fetchone() == (2,)
+    assert db.execute("SELECT value FROM counters WHERE name = 'data_version'").fetchone()[0] == version + 1
+    db.close()
+
+    assert source_code.migrate_file(legacy) == (len(source_code.MIGRATIONS),) * 2
+
+
+def test_compact_events_keeps_the_sequence_of_an_emptied_table(tmp_path):
+    path = str(tmp_path / 'mydb.db')
+    baseline(path, [('only', '05-03-2030', '09:00', '10:00', None)], delete=[1])
+    source_code.migrate_file(path)
+
+    db = sqlite3.connect(path)
+    assert db.execute("SELECT name, seq FROM sqlite_sequence").fetchall() == [('events', 1)]
+    assert db.execute("SELECT value FROM counters WHERE name = 'events'").fetchone() == (0,)
+    assert db.execute(source_code.INSERT_EVENT, ('new', '2030-03-05', 540, 600, 'x', 'Sydney', 'NSW', '2000', None,
+                                                 '2030-01-01 00:00:00')).lastrowid == 2
+    db.close()
+
+
+def test_migrated_events_are_served_in_the_api_format(legacy, monkeypatch):
+    source_code.migrate_file(legacy)
+    monkeypatch.setattr(source_code, 'database', source_code.Database(legacy))
+    monkeypatch.setattr(source_code, 'response_cache', None)
+    client = source_code.app.test_client()
+    listing = client.get('/events?order=%2Bid&filter=id,date,from,to&size=10').json
+    source_code.database.release()
+    assert listing['total'] == 4
+    assert listing['events'] == [
+        {'id': 1, 'date': '05-03-2030', 'from': '09:00', 'to': '10:30'},
+        {'id': 2, 'date': '05-03-2030', 'from': '11:00', 'to': '12:00'},
+        {'id': 3, 'date': None, 'from': '13:00', 'to': '14:00'},
+        {'id': 4, 'date': '07-03-2030', 'from': '09:05', 'to': '10:00'}
+    ]
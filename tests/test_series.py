@@ -0,0 +1,156 @@
+import datetime
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import source_code  # noqa: E402
+from source_code import Series, parse_repeat  # noqa: E402
+
+LOCATION = {'street': '1 George St', 'suburb': 'Sydney', 'state': 'NSW', 'post-code': '2000'}
+
+
+def rule(freq, start, interval=1, until=None, exdates=(), start_min=600, end_min=660, series_id=None):
+    return Series((series_id, 'standup', start, start_min, end_min) + (None,) * 6 +
+                  (freq, interval, None, until, json.dumps(sorted(exdates))))
+
+
+def days(first, last):
+    day = first
+    while day <= last:
+        yield day
+        day += datetime.timedelta(days=1)
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(source_code, 'database', source_code.Database(str(tmp_path / 'events.db')))
+    monkeypatch.setattr(source_code, 'response_cache', None)
+    yield source_code.app.test_client()
+    source_code.database.release()
+
+
+@pytest.mark.parametrize('freq, start, interval', [
+    ('daily', '2030-01-30', 1),
+    ('daily', '2030-01-30', 3),
+    ('weekly', '2030-01-31', 2),
+    ('monthly', '2030-01-31', 1),
+    ('monthly', '2028-02-29', 12),
+    ('monthly', '2030-03-15', 5),
+])
+def test_dates_match_occurs_on(freq, start, interval):
+    s = rule(freq, start, interval, until='2034-12-31', exdates=['2030-03-31', '2031-01-31'])
+    first, last = datetime.date(2029, 12, 1), datetime.date(2033, 6, 30)
+    expected = [day for day in days(first, last) if s.occurs_on(day)]
+    assert list(s.occurrences(first, last)) == expected
+    assert list(s.occurrences(first, last, reverse=True)) == expected[::-1]
+    assert s.count_between(first, last) == len(expected)
+    assert expected and all(day.isoformat() not in s.exdates for day in expected)
+
+
+def test_monthly_skips_short_months():
+    s = rule('monthly', '2030-01-31', until='2030-12-31')
+    assert [d.month for d in s.occurrences(s.start, s.end)] == [1, 3, 5, 7, 8, 10, 12]
+
+
+def test_bounded_series_is_not_cut_at_the_horizon(monkeypatch):
+    monkeypatch.setattr(source_code, 'SERIES_HORIZON', datetime.timedelta(days=1))
+    start = datetime.date.today() + datetime.timedelta(days=400)
+    bounded = rule('daily', start.isoformat(), until=(start + datetime.timedelta(days=4)).isoformat())
+    assert bounded.count_between(start, start + datetime.timedelta(days=30)) == 5
+    unbounded = rule('daily', start.isoformat())
+    assert unbounded.count_between(start, start + datetime.timedelta(days=30)) == 0
+    assert unbounded.occurs_on(start)
+
+
+def test_count_resolves_until():
+    assert parse_repeat({'freq': 'weekly', 'interval': 2, 'count': 3}, '2030-03-01')[3] == '2030-03-29'
+    # excluded dates still use up the count
+    assert parse_repeat({'freq': 'daily', 'count': 3, 'except': ['02-03-2030']}, '2030-03-01')[3] == '2030-03-03'
+
+
+def test_count_past_year_9999_is_rejected():
+    with pytest.raises(ValueError):
+        parse_repeat({'freq': 'daily', 'interval': 1000, 'count': 10000}, '2030-03-01')
+
+
+def test_until_is_held_to_the_count_limit():
+    with pytest.raises(ValueError):
+        parse_repeat({'freq': 'daily', 'until': '31-12-9999'}, '2030-03-01')
+    assert parse_repeat({'freq': 'monthly', 'until': '31-12-2800'}, '2030-03-01')[3] == '2800-12-31'
+
+
+def test_series_beyond_the_horizon_is_listed_and_enforced(client):
+    body = dict(name='daily', date='01-03-2030', location=LOCATION, repeat={'freq': 'daily', 'count': 5},
+                **{'from': '10:00', 'to': '11:00'})
+    assert client.post('/series', json=body).status_code == 201
+
+    listing = client.get('/events?from=01-03-2030&to=31-03-2030&filter=date,from').json
+    assert listing['total'] == 5
+    assert [e['date'] for e in listing['events']] == [f'0{d}-03-2030' for d in range(1, 6)]
+    stats = client.get('/events/statistics?from=01-03-2030&to=31-03-2030').json
+    assert stats['total-range'] == 5
+    assert len(client.get('/series/1?from=01-03-2030&to=31-03-2030').json['occurrences']) == 5
+
+    clash = dict(name='clash', date='04-03-2030', location=LOCATION, **{'from': '10:30', 'to': '11:30'})
+    assert client.post('/events', json=clash).status_code == 400
+    clash['date'] = '06-03-2030'
+    assert client.post('/events', json=clash).status_code == 201
+
+
+@pytest.mark.parametrize('order', ['+date,+from', '-date,-from', '+name,+date', '-name,+date', '+from,-date'])
+def test_merged_pages_match_the_full_listing(client, order):
+    for day in (2, 5, 9, 12):
+        event = dict(name=f'event {day}', date=f'{day:02d}-03-2030', location=LOCATION,
+                     **{'from': '09:00', 'to': '09:30'})
+        assert client.post('/events', json=event).status_code == 201
+    for name, repeat, start, end in (('weekly', {'freq': 'weekly', 'count': 3}, '10:00', '11:00'),
+                                     ('every other day', {'freq': 'daily', 'interval': 2, 'count': 20},
+                                      '12:00', '13:00')):
+        series = dict(name=name, date='01-03-2030', location=LOCATION, repeat=repeat, **{'from': start, 'to': end})
+        assert client.post('/series', json=series).status_code == 201
+
+    query = f'/events?from=01-03-2030&to=20-03-2030&filter=name,date,from&order={order.replace("+", "%2B")}'
+    everything = client.get(f'{query}&size=100').json
+    assert everything['total'] == len(everything['events']) == 4 + 3 + 10
+
+    by_page, page = [], 1
+    while True:
+        result = client.get(f'{query}&size=4&page={page}').json
+        by_page += result['events']
+        if len(result['events']) < 4:
+            break
+        page += 1
+    assert by_page == everything['events']
+
+    by_cursor, cursor = [], None
+    while True:
+        result = client.get(f'{query}&size=4' + (f'&cursor={cursor}' if cursor else '')).json
+        by_cursor += result['events']
+        cursor = result.get('next-cursor')
+        if cursor is None:
+            break
+    assert by_cursor == everything['events']
+
+
+def test_series_conflict(client):
+    event = dict(name='event', date='08-03-2030', location=LOCATION, **{'from': '10:30', 'to': '11:30'})
+    assert client.post('/events', json=event).status_code == 201
+
+    with source_code.app.app_context():
+        assert source_code.series_conflict(rule('weekly', '2030-03-01', until='2030-03-31')) == ('event', 1)
+        assert source_code.series_conflict(rule('weekly', '2030-03-02', until='2030-03-31')) is None
+        assert source_code.series_conflict(rule('weekly', '2030-03-01', until='2030-03-07')) is None
+        assert source_code.series_conflict(rule('weekly', '2030-03-01', start_min=690, end_min=720)) is None
+        assert source_code.series_conflict(rule('weekly', '2030-03-01', exdates=['2030-03-08'])) is None
+
+    weekly = dict(name='weekly', date='02-03-2030', location=LOCATION, repeat={'freq': 'weekly', 'count': 10},
+                  **{'from': '10:00', 'to': '11:00'})
+    assert client.post('/series', json=weekly).status_code == 201
+    with source_code.app.app_context():
+        # meets the weekly series on 16-03-2030
+        assert source_code.series_conflict(rule('daily', '2030-03-14', 2, '2030-04-30')) == ('series', 1)
+        assert source_code.series_conflict(rule('daily', '2030-03-03', 7, '2030-04-30')) is None